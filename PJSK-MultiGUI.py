@@ -1,29 +1,25 @@
 from __future__ import annotations
 
+import importlib.util
 import platform
 import logging
-import random
 import sys
-import tempfile
-from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
 
-import soundfile as sf
-import torch
-from PySide6.QtCore import Qt, QUrl
+from PySide6.QtCore import Qt, QTimer, Signal
 from PySide6.QtGui import QFont
-from PySide6.QtMultimedia import QSoundEffect
-from PySide6.QtWidgets import (QApplication, QComboBox, QFileDialog, QGridLayout,
+from PySide6.QtWidgets import (QApplication, QCheckBox, QComboBox, QFileDialog, QGridLayout,
                              QGroupBox, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-                             QSlider, QTextEdit, QVBoxLayout, QWidget)
+                             QSlider, QSpinBox, QTextEdit, QVBoxLayout, QWidget)
 
-import commons
-import utils
-from models import SynthesizerTrn
-from text import transform
-from text.cleaners import (japanese_cleaners, japanese_cleaners2,
-                           japanese_tokenization_cleaners)
+# torch, soundfile, models, utils and the text cleaners are imported lazily:
+# the worker warms them up in the background once the window has painted.
+from model_pool import DEFAULT_BUDGET_MB
+from player import StreamPlayer
+from presets import (CONFIG_TO_PRESET, DEFAULT_SEED, MULTI_SPK_GROUPS,
+                     SAMPLE_RATE, SYMBOL_PRESETS)
+from text import memo
+from worker import SynthesisJob, SynthesisService
 
 logger = logging.getLogger("PJSK-MultiGUI")
 # 设置日志等级
@@ -31,9 +27,12 @@ logger.setLevel(logging.DEBUG)
 # 追加写入文件a ，设置utf-8编码防止中文写入乱码
 if platform.system() == "Darwin":
     log_dir = Path.home() / "Library/Logs/PJSK-MultiGUI"
+    cache_dir = Path.home() / "Library/Caches/PJSK-MultiGUI"
 else:
     log_dir = Path.home() / "PJSK-MultiGUI/logs"
+    cache_dir = Path.home() / "PJSK-MultiGUI/cache"
 log_dir.mkdir(parents=True, exist_ok=True)
+cache_dir.mkdir(parents=True, exist_ok=True)
 handler = logging.FileHandler(log_dir / "app.log", encoding="utf-8")
 # 向文件输出的日志信息格式
 handler.setFormatter(
@@ -43,54 +42,29 @@ handler.setFormatter(
 logger.addHandler(handler)
 
 
-@dataclass(frozen=True)
-class SymbolPreset:
-    id: int
-    symbols: List[str]
-
-
-SYMBOL_PRESETS: Dict[str, SymbolPreset] = {
-    "default": SymbolPreset(1, list(' !"&*,-.?ABCINU[]abcdefghijklmnoprstuwyz{}~')),
-    "preset2": SymbolPreset(2, [
-        "_", *list(",.!?-"),
-        *list("AEINOQUabdefghijkmnoprstuvwyzʃʧ↓↑ ")]),
-    "preset3": SymbolPreset(3, [
-        "_", *list(",.!?-~…"),
-        *list("AEINOQUabdefghijkmnoprstuvwyzʃʧʦ↓↑ ")]),
-    "ipa": SymbolPreset(4, [
-        "_", *list(";:,.!?¡¿—…\"«»“” "),
-        *list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"),
-        *list("ɑɐɒæɓʙβɔɕçɗɖðʤəɘɚɛɜɝɞɟʄɡɠɢʛɦɧħɥʜɨɪʝɭɬɫɮʟɱɯɰŋɳɲɴøɵɸθœɶʘɹɺɾɻʀʁɽʂʃʈʧʉʊʋⱱʌɣɤʍχʎʏʑʐʒʔʡʕʢǀǁǂǃˈˌːˑʼʴʰʱʲʷˠˤ˞↓↑→↗↘'̩'ᵻ")]),
+STAGE_NAMES = {
+    "clean": "文本处理",
+    "cache": "命中音频缓存",
+    "infer": "推理",
 }
 
-CONFIG_TO_PRESET = {
-    "mmj.json": "default",
-    "vbs.json": "default",
-    "ws.json": "default",
-    "mafuyu.json": "default",
+# Inference backends offered in the model group; keys match synthesis.BACKENDS.
+BACKEND_NAMES = {
+    "eager": "PyTorch",
+    "compiled": "TorchScript",
+    "onnx": "ONNX Runtime",
+    "int8": "PyTorch int8",
+    "bf16": "PyTorch bf16",
 }
+# onnxruntime is optional; without it the ONNX backend is not offered.
+if importlib.util.find_spec("onnxruntime") is None:
+    del BACKEND_NAMES["onnx"]
 
-MULTI_SPK_GROUPS = {
-    "mmj.json": ["minori", "haruka", "airi", "shizuku"],
-    "vbs.json": ["akito", "an", "kohane", "toya"],
-    "ws.json": ["emu", "nene", "rui", "tsukasa"],
-    "mafuyu.json": ["white", "black"],
-}
-
-def clean_text(text: str, preset: SymbolPreset) -> torch.LongTensor:
-    """Convert raw text to tensor according to preset symbols."""
-    cleaner_map = {
-        1: japanese_tokenization_cleaners,
-        2: japanese_cleaners,
-        3: japanese_cleaners2,
-        4: japanese_tokenization_cleaners,
-    }
-    cleaner = cleaner_map.get(preset.id, japanese_tokenization_cleaners)
-    seq = transform.cleaned_text_to_sequence(cleaner(text), preset.symbols)
-    return torch.LongTensor(commons.intersperse(seq, 0)) if commons else torch.LongTensor(seq)
 
 class Window(QWidget):
-    SAMPLE_RATE = 22050
+    SAMPLE_RATE = SAMPLE_RATE
+
+    first_painted = Signal()
 
     def __init__(self) -> None:
         super().__init__()
@@ -100,12 +74,11 @@ class Window(QWidget):
         self._center_on_screen()
 
         self.hps = None  # type: ignore
-        self.model: Optional[SynthesizerTrn] = None
+        self.model_ready = False
         self.current_preset = SYMBOL_PRESETS["default"]
         self.multi_speaker = False
         self.speaker_id: int = 0
         self.current_audio = None  # type: ignore
-        self.current_audio_path: Optional[Path] = None
         """
         self.initUI()
         self.loadModel = False
@@ -119,7 +92,42 @@ class Window(QWidget):
         self.MultiId = 0
         """
 
+        self._painted = False
         self._init_ui()
+        self._init_service()
+
+    def _init_service(self) -> None:
+        self.service = SynthesisService(self, cache_dir=cache_dir / "audio", graph_dir=cache_dir / "graphs")
+        worker = self.service.worker
+        worker.model_loaded.connect(self._model_loaded)
+        worker.model_failed.connect(lambda msg: self._error(f"模型文件加载失败: {msg}"))
+        worker.job_progress.connect(self._job_progress)
+        worker.job_chunk.connect(self._job_chunk)
+        worker.job_finished.connect(self._job_finished)
+        worker.job_failed.connect(self._job_failed)
+        worker.job_cancelled.connect(self._job_cancelled)
+        worker.cache_stats.connect(self._cache_stats)
+        worker.pool_stats.connect(self._pool_stats)
+        worker.ready.connect(lambda seconds: self._log(f"初始化完成 ({seconds:.2f}s)"))
+        self.player = StreamPlayer(SAMPLE_RATE, self)
+        self.streaming_jobs = set()
+        self.first_painted.connect(self._warm_up)
+
+    def paintEvent(self, event) -> None:
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            # Let this paint reach the screen before starting the heavy imports.
+            QTimer.singleShot(0, self.first_painted.emit)
+
+    def _warm_up(self) -> None:
+        self.service.warm_up()
+        memo.enable_persistence(cache_dir / "text_cache.pkl")
+
+    def closeEvent(self, event) -> None:
+        self.service.shutdown()
+        super().closeEvent(event)
+
     def _init_ui(self) -> None:
         layout = QGridLayout(self)
 
@@ -136,9 +144,22 @@ class Window(QWidget):
         model_btn = QPushButton("选择文件")
         model_btn.clicked.connect(self._select_model)
 
+        self.backend_combo = QComboBox()
+        for backend, name in BACKEND_NAMES.items():
+            self.backend_combo.addItem(name, backend)
+        self.backend_combo.currentIndexChanged.connect(self._backend_changed)
+
+        self.pool_budget_spin = QSpinBox()
+        self.pool_budget_spin.setRange(256, 65536); self.pool_budget_spin.setSingleStep(256)
+        self.pool_budget_spin.setValue(DEFAULT_BUDGET_MB); self.pool_budget_spin.setSuffix(" MB")
+        self.pool_budget_spin.setKeyboardTracking(False)
+        self.pool_budget_spin.valueChanged.connect(self._pool_budget_changed)
+
         row1 = QHBoxLayout(); row1.addWidget(cfg_btn); row1.addWidget(self.cfg_path_edit)
         row2 = QHBoxLayout(); row2.addWidget(model_btn); row2.addWidget(self.model_path_edit)
-        mg_layout.addLayout(row1); mg_layout.addLayout(row2)
+        row3 = QHBoxLayout(); row3.addWidget(QLabel("推理后端")); row3.addWidget(self.backend_combo); row3.addStretch()
+        row3.addWidget(QLabel("模型缓存上限")); row3.addWidget(self.pool_budget_spin)
+        mg_layout.addLayout(row1); mg_layout.addLayout(row2); mg_layout.addLayout(row3)
         model_group.setLayout(mg_layout)
         layout.addWidget(model_group, 0, 0)
 
@@ -165,7 +186,13 @@ class Window(QWidget):
         self.speed_slider.valueChanged.connect(lambda v: self.speed_label.setText(f"当前语速：{v/100:.2f}"))
         self.speed_label = QLabel("当前语速：1.00")
         gen_btn = QPushButton("生成"); gen_btn.clicked.connect(self._generate_audio)
-        slider_row.addWidget(self.speed_slider); slider_row.addWidget(self.speed_label); slider_row.addWidget(gen_btn)
+        cancel_btn = QPushButton("取消"); cancel_btn.clicked.connect(self._cancel_jobs)
+        self.stream_check = QCheckBox("边生成边播放")
+        self.batch_g2p_check = QCheckBox("批量G2P")
+        self.batch_g2p_check.setToolTip("整段调用一次 OpenJTalk，速度更快；词边界处的读音可能与逐词处理略有不同")
+        self.seed_spin = QSpinBox(); self.seed_spin.setRange(0, 2**31 - 1); self.seed_spin.setValue(DEFAULT_SEED); self.seed_spin.setPrefix("种子 ")
+        slider_row.addWidget(self.speed_slider); slider_row.addWidget(self.speed_label); slider_row.addWidget(self.seed_spin); slider_row.addWidget(self.stream_check); slider_row.addWidget(self.batch_g2p_check)
+        slider_row.addWidget(gen_btn); slider_row.addWidget(cancel_btn)
         tts_layout.addLayout(slider_row)
         tts_group.setLayout(tts_layout)
         layout.addWidget(tts_group, 2, 0, 2, 1)
@@ -198,6 +225,7 @@ class Window(QWidget):
         self._load_model(Path(file_path))
 
     def _load_config(self, cfg_path: Path) -> None:
+        import utils
         try:
             self.hps = utils.get_hparams_from_file(str(cfg_path))
             self._update_symbol_preset(cfg_path.name)
@@ -210,19 +238,27 @@ class Window(QWidget):
         if self.hps is None:
             self._error("请先载入配置文件。")
             return
-        try:
-            self.model = SynthesizerTrn(
-                len(self.current_preset.symbols),
-                self.hps.data.filter_length // 2 + 1,
-                self.hps.train.segment_size // self.hps.data.hop_length,
-                n_speakers=self.hps.data.n_speakers,
-                **self.hps.model,
-            )
-            self.model.eval()
-            utils.load_checkpoint(str(model_path), self.model, None)
-            self._log(f"模型文件加载成功: {model_path.name}")
-        except Exception as exc:
-            self._error(f"模型文件加载失败: {exc}")
+        self.model_ready = False
+        self._log(f"正在加载模型: {model_path.name} ({self.backend_combo.currentText()})")
+        self.service.load_model(Path(self.cfg_path_edit.text()), model_path, self.current_preset,
+                                self.backend_combo.currentData())
+
+    def _backend_changed(self, _index: int) -> None:
+        self._log(f"推理后端: {self.backend_combo.currentText()}")
+        if self.model_path_edit.text():
+            self._load_model(Path(self.model_path_edit.text()))
+
+    def _pool_budget_changed(self, budget_mb: int) -> None:
+        self.service.set_pool_budget(budget_mb)
+
+    def _pool_stats(self, stats: dict) -> None:
+        self._log("模型缓存上限: {budget_mb} MB，常驻 {models} 个 ({resident_mb} MB)".format(**stats))
+
+    def _model_loaded(self, name: str, stats: dict) -> None:
+        self.model_ready = True
+        self._log(f"模型文件加载成功: {name}")
+        self._log("模型缓存: 命中 {hits} / 未命中 {misses} / 淘汰 {evictions}，"
+                  "常驻 {models} 个 ({resident_mb}/{budget_mb} MB)".format(**stats))
 
     def _update_symbol_preset(self, cfg_name: str) -> None:
         preset_key = CONFIG_TO_PRESET.get(cfg_name, "default")
@@ -255,58 +291,80 @@ class Window(QWidget):
         geometry = self.frameGeometry(); geometry.moveCenter(self.screen().availableGeometry().center()); self.move(geometry.topLeft())
         
     def _play_audio(self):
-        if not self.current_audio_path or not self.current_audio_path.exists():
-            self._error("没有可播放的音频文件。请先生成音频。")
+        if self.current_audio is None:
+            self._error("没有可播放的音频。请先生成音频。")
             return
         try:
-            effect = QSoundEffect(self)
-            effect.setSource(QUrl.fromLocalFile(str(self.current_audio_path)))
-            effect.setLoopCount(1)
-            effect.setVolume(1.0)
-            effect.play()
-            self._playing_effect = effect
-            effect.play()
-            self._log(f"播放: {self.current_audio_path.name}")
+            self.player.start()
+            self.player.write(self.current_audio)
+            self.player.close()
+            self._log(f"播放: {len(self.current_audio) / self.SAMPLE_RATE:.2f} 秒")
         except Exception as e:
             self._error(f"播放失败: {e}")
 
     def _generate_audio(self) -> None:
-        if self.model is None or self.hps is None:
+        if not self.model_ready or self.hps is None:
             self._error("模型或配置未加载。请先选择模型和配置文件。")
             return
-        raw_text = self.text_edit.toPlainText().strip()
+        raw_text = self.text_edit.toPlainText().replace('\n', ' ').strip()
         if not raw_text:
             self._error("请输入要合成的文本。")
             return
-        self._log("开始生成音频...")
-        
-        try:
-            with torch.no_grad():
-                raw_text = self.text_edit.toPlainText()
-                raw_text = raw_text.replace('\n', ' ').strip()
-                stn = clean_text(raw_text, self.current_preset)
-                x_tst = stn.unsqueeze(0)
-                x_len = torch.LongTensor([stn.size(0)])
-                infer_kwargs = dict(
-                    noise_scale=0.667,
-                    noise_scale_w=0.8,
-                    length_scale=self.speed_slider.value() / 100.0,
-                )
-                if self.multi_speaker:
-                    audio = self.model.infer(x_tst, x_len, sid=torch.LongTensor([self.speaker_id]), **infer_kwargs)[0][0, 0].cpu().numpy()
-                else:
-                    audio = self.model.infer(x_tst, x_len, **infer_kwargs)[0][0, 0].cpu().numpy()
-                # Save to temp file
-                self.current_audio = audio
-                temp_dir = Path(tempfile.gettempdir()) / "PJSK-MultiGUI"
-                temp_dir.mkdir(exist_ok=True)
-                safe_name = raw_text.replace("?", "").strip()[:10] or "voice"
-                self.current_audio_path = temp_dir / f"{safe_name}_{random.randint(1000,9999)}.wav"
-                sf.write(self.current_audio_path, audio, self.SAMPLE_RATE)
-                self._log("音频生成成功。")
-        except Exception as exc:
-            self._error(f"推理失败: {exc}")
-    
+        job = SynthesisJob(
+            text=raw_text,
+            preset=self.current_preset,
+            speaker_id=self.speaker_id if self.multi_speaker else None,
+            length_scale=self.speed_slider.value() / 100.0,
+            streaming=self.stream_check.isChecked(),
+            seed=self.seed_spin.value(),
+            batch_g2p=self.batch_g2p_check.isChecked(),
+        )
+        if job.streaming:
+            self.streaming_jobs.add(job.job_id)
+        self.service.submit(job)
+        self._log(f"[{job.job_id}] 开始生成音频... (队列中: {len(self.service.pending)})")
+
+    def _job_progress(self, job_id: int, stage: str, step: int, total: int) -> None:
+        name = STAGE_NAMES.get(stage, stage)
+        if total > 1:
+            name = f"{name} ({step}/{total})"
+        self._log(f"[{job_id}] {name}...")
+
+    def _job_chunk(self, job_id: int, chunk) -> None:
+        if job_id in self.streaming_jobs and len(chunk):
+            self.player.write(chunk)
+
+    def _job_finished(self, job_id: int, audio) -> None:
+        self.current_audio = audio
+        self._streaming_job_done(job_id)
+        self._log(f"[{job_id}] 音频生成成功。")
+
+    def _job_failed(self, job_id: int, message: str) -> None:
+        self._streaming_job_done(job_id)
+        self._error(f"[{job_id}] 推理失败: {message}")
+
+    def _job_cancelled(self, job_id: int) -> None:
+        if job_id in self.streaming_jobs:
+            self.player.stop()
+        self._streaming_job_done(job_id)
+        self._log(f"[{job_id}] 已取消。")
+
+    def _cache_stats(self, stats: dict) -> None:
+        self._log("音频缓存命中率: {:.0%} (内存 {memory_hits} / 磁盘 {disk_hits} / 未命中 {misses})".format(
+            stats["hit_rate"], **stats))
+
+    def _streaming_job_done(self, job_id: int) -> None:
+        self.streaming_jobs.discard(job_id)
+        if not self.streaming_jobs:
+            self.player.close()
+
+    def _cancel_jobs(self) -> None:
+        if not self.service.pending:
+            self._log("没有正在进行的任务。")
+            return
+        self.service.cancel_all()
+        self._log("正在取消任务...")
+
     def _save_audio(self) -> None:
         if self.current_audio is None:
             self._error("没有生成音频可保存。请先生成音频。")
@@ -315,6 +373,7 @@ class Window(QWidget):
         if not target:
             return
         try:
+            import soundfile as sf
             sf.write(target, self.current_audio, self.SAMPLE_RATE)
             self._log(f"保存到: {target}")
         except Exception as exc:
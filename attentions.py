@@ -1,3 +1,4 @@
+import collections
 import copy
 import math
 import numpy as np
@@ -10,8 +11,45 @@ import modules
 from modules import LayerNorm
    
 
+# Lengths per MultiHeadAttention whose relative embeddings / proximal bias are kept.
+LENGTH_CACHE_SIZE = 32
+
+
+def _exporting():
+  """Whether torch is tracing, exporting or compiling, when the per-length caches must stay out of the graph."""
+  if torch.jit.is_tracing() or torch.onnx.is_in_onnx_export():
+    return True
+  compiler = getattr(torch, 'compiler', None)
+  return compiler is not None and hasattr(compiler, 'is_compiling') and compiler.is_compiling()
+
+
+def cache_stats(model):
+  """Hits, misses and entries of the per-length caches of every attention layer in model."""
+  stats = {'hits': 0, 'misses': 0, 'entries': 0}
+  for module in model.modules():
+    if isinstance(module, MultiHeadAttention):
+      stats['hits'] += module.cache_hits
+      stats['misses'] += module.cache_misses
+      stats['entries'] += len(module._length_cache)
+  return stats
+
+
+def set_attention_block_size(model, block_size):
+  """Switch every text encoder in model to blocked attention (block_size queries at a time), or back to dense with 0/None.
+
+  The same as setting attention_block_size in the config's "model" section,
+  but for an already loaded model; the weights are unaffected.
+  """
+  block_size = block_size or None
+  for module in model.modules():
+    if isinstance(module, Encoder):
+      module.attention_block_size = block_size
+    elif isinstance(module, MultiHeadAttention):
+      module.block_size = block_size
+
+
 class Encoder(nn.Module):
-  def __init__(self, hidden_channels, filter_channels, n_heads, n_layers, kernel_size=1, p_dropout=0., window_size=4, **kwargs):
+  def __init__(self, hidden_channels, filter_channels, n_heads, n_layers, kernel_size=1, p_dropout=0., window_size=4, attention_block_size=None, **kwargs):
     super().__init__()
     self.hidden_channels = hidden_channels
     self.filter_channels = filter_channels
@@ -20,6 +58,7 @@ class Encoder(nn.Module):
     self.kernel_size = kernel_size
     self.p_dropout = p_dropout
     self.window_size = window_size
+    self.attention_block_size = attention_block_size
 
     self.drop = nn.Dropout(p_dropout)
     self.attn_layers = nn.ModuleList()
@@ -27,16 +66,18 @@ class Encoder(nn.Module):
     self.ffn_layers = nn.ModuleList()
     self.norm_layers_2 = nn.ModuleList()
     for i in range(self.n_layers):
-      self.attn_layers.append(MultiHeadAttention(hidden_channels, hidden_channels, n_heads, p_dropout=p_dropout, window_size=window_size))
+      self.attn_layers.append(MultiHeadAttention(hidden_channels, hidden_channels, n_heads, p_dropout=p_dropout, window_size=window_size, block_size=attention_block_size))
       self.norm_layers_1.append(LayerNorm(hidden_channels))
       self.ffn_layers.append(FFN(hidden_channels, hidden_channels, filter_channels, kernel_size, p_dropout=p_dropout))
       self.norm_layers_2.append(LayerNorm(hidden_channels))
 
   def forward(self, x, x_mask):
-    attn_mask = x_mask.unsqueeze(2) * x_mask.unsqueeze(-1)
+    # Blocked attention builds each block's mask rows from x_mask, so the
+    # full [b, 1, t, t] mask is never materialized.
+    attn_mask = None if self.attention_block_size else x_mask.unsqueeze(2) * x_mask.unsqueeze(-1)
     x = x * x_mask
     for i in range(self.n_layers):
-      y = self.attn_layers[i](x, x, attn_mask)
+      y = self.attn_layers[i](x, x, attn_mask, x_mask=x_mask)
       y = self.drop(y)
       x = self.norm_layers_1[i](x + y)
 
@@ -99,7 +140,7 @@ class Decoder(nn.Module):
 
 
 class MultiHeadAttention(nn.Module):
-  def __init__(self, channels, out_channels, n_heads, p_dropout=0., window_size=None, heads_share=True, block_length=None, proximal_bias=False, proximal_init=False):
+  def __init__(self, channels, out_channels, n_heads, p_dropout=0., window_size=None, heads_share=True, block_length=None, proximal_bias=False, proximal_init=False, block_size=None):
     super().__init__()
     assert channels % n_heads == 0
 
@@ -112,7 +153,12 @@ class MultiHeadAttention(nn.Module):
     self.block_length = block_length
     self.proximal_bias = proximal_bias
     self.proximal_init = proximal_init
+    self.block_size = block_size
     self.attn = None
+    self.cache_size = LENGTH_CACHE_SIZE
+    self._length_cache = collections.OrderedDict()
+    self.cache_hits = 0
+    self.cache_misses = 0
 
     self.k_channels = channels // n_heads
     self.conv_q = nn.Conv1d(channels, channels, 1)
@@ -135,12 +181,19 @@ class MultiHeadAttention(nn.Module):
         self.conv_k.weight.copy_(self.conv_q.weight)
         self.conv_k.bias.copy_(self.conv_q.bias)
       
-  def forward(self, x, c, attn_mask=None):
+  def forward(self, x, c, attn_mask=None, x_mask=None):
+    """x_mask [b, 1, t] stands in for attn_mask in self-attention when attn_mask is None."""
     q = self.conv_q(x)
     k = self.conv_k(c)
     v = self.conv_v(c)
     
-    x, self.attn = self.attention(q, k, v, mask=attn_mask)
+    if self.block_size and q.size(2) > self.block_size and not torch.jit.is_tracing():
+      # The traced/exported graphs keep the dense path; its loop would be unrolled per length.
+      x, self.attn = self.blocked_attention(q, k, v, mask=attn_mask, x_mask=x_mask), None
+    else:
+      if attn_mask is None and x_mask is not None:
+        attn_mask = x_mask.unsqueeze(2) * x_mask.unsqueeze(-1)
+      x, self.attn = self.attention(q, k, v, mask=attn_mask)
 
     x = self.conv_o(x)
     return x
@@ -161,14 +214,16 @@ class MultiHeadAttention(nn.Module):
       scores = scores + scores_local
     if self.proximal_bias:
       assert t_s == t_t, "Proximal bias is only available for self-attention."
-      scores = scores + self._attention_bias_proximal(t_s).to(device=scores.device, dtype=scores.dtype)
+      bias = self._cached(lambda: ('proximal', t_s, scores.device, scores.dtype),
+                          lambda: self._attention_bias_proximal(t_s).to(device=scores.device, dtype=scores.dtype))
+      scores = scores + bias
     if mask is not None:
       scores = scores.masked_fill(mask == 0, -1e4)
       if self.block_length is not None:
         assert t_s == t_t, "Local attention is only available for self-attention."
         block_mask = torch.ones_like(scores).triu(-self.block_length).tril(self.block_length)
         scores = scores.masked_fill(block_mask == 0, -1e4)
-    p_attn = F.softmax(scores, dim=-1) # [b, n_h, t_t, t_s]
+    p_attn = F.softmax(scores, dim=-1, dtype=torch.float32).type_as(scores) # [b, n_h, t_t, t_s], summed in float32 under autocast
     p_attn = self.drop(p_attn)
     output = torch.matmul(p_attn, value)
     if self.window_size is not None:
@@ -178,6 +233,63 @@ class MultiHeadAttention(nn.Module):
     output = output.transpose(2, 3).contiguous().view(b, d, t_t) # [b, n_h, t_t, d_k] -> [b, d, t_t]
     return output, p_attn
 
+  def blocked_attention(self, query, key, value, mask=None, x_mask=None):
+    """Self-attention computed block_size queries at a time, same result as attention.
+
+    Scores are [b, n_h, block_size, t] per block instead of [b, n_h, t, t],
+    and the relative-position terms are only computed inside the
+    window_size band, where the dense path's padded embeddings are nonzero.
+    """
+    b, d, t = key.size()
+    assert query.size(2) == t, "Blocked attention is only available for self-attention."
+    query = query.view(b, self.n_heads, self.k_channels, t).transpose(2, 3)
+    key = key.view(b, self.n_heads, self.k_channels, t).transpose(2, 3)
+    value = value.view(b, self.n_heads, self.k_channels, t).transpose(2, 3)
+    positions = torch.arange(t, device=query.device)
+
+    outputs = []
+    for start in range(0, t, self.block_size):
+      end = min(start + self.block_size, t)
+      q = query[:, :, start:end] / math.sqrt(self.k_channels)
+      scores = torch.matmul(q, key.transpose(-2, -1)) # [b, n_h, l, t]
+      diff = positions.unsqueeze(0) - positions[start:end].unsqueeze(1) # key - query, [l, t]
+      if self.window_size is not None:
+        band, in_range = self._relative_band(start, end, t, query.device)
+        rel_logits = self._matmul_with_relative_keys(q, self.emb_rel_k).masked_fill(~in_range, 0)
+        scores = scores.scatter_add(-1, band.expand(b, self.n_heads, -1, -1), rel_logits)
+      if self.proximal_bias:
+        scores = scores + (-torch.log1p(diff.abs().to(scores.dtype)))
+      if mask is not None:
+        block_mask = mask[:, :, start:end]
+      elif x_mask is not None:
+        block_mask = x_mask[:, :, start:end].unsqueeze(-1) * x_mask.unsqueeze(2)
+      else:
+        block_mask = None
+      if block_mask is not None:
+        scores = scores.masked_fill(block_mask == 0, -1e4)
+        if self.block_length is not None:
+          scores = scores.masked_fill(diff.abs() > self.block_length, -1e4)
+      p_attn = F.softmax(scores, dim=-1, dtype=torch.float32).type_as(scores)
+      p_attn = self.drop(p_attn)
+      output = torch.matmul(p_attn, value)
+      if self.window_size is not None:
+        relative_weights = p_attn.gather(-1, band.expand(b, self.n_heads, -1, -1)).masked_fill(~in_range, 0)
+        output = output + self._matmul_with_relative_values(relative_weights, self.emb_rel_v)
+      outputs.append(output)
+    output = torch.cat(outputs, 2)
+    return output.transpose(2, 3).contiguous().view(b, d, t) # [b, n_h, t, d_k] -> [b, d, t]
+
+  def _relative_band(self, start, end, length, device):
+    """Key index of each relative offset -window_size..window_size for queries start..end-1.
+
+    Returns the indices, clamped into range, as [1, 1, l, 2w+1] and a bool mask of
+    the offsets that land inside the sequence.
+    """
+    offsets = torch.arange(-self.window_size, self.window_size + 1, device=device)
+    band = torch.arange(start, end, device=device).unsqueeze(1) + offsets
+    in_range = (band >= 0) & (band < length)
+    return band.clamp(0, length - 1)[None, None], in_range[None, None]
+
   def _matmul_with_relative_values(self, x, y):
     """
     x: [b, h, l, m]
@@ -196,19 +308,44 @@ class MultiHeadAttention(nn.Module):
     ret = torch.matmul(x, y.unsqueeze(0).transpose(-2, -1))
     return ret
 
+  def _cached(self, key, build):
+    """build(), kept per key in a small LRU while gradients are off.
+
+    Keys carry the parameter's data_ptr and _version, so loading or editing
+    weights makes old entries unreachable; they age out of the LRU.  key is
+    a callable, only evaluated when caching: tracing and export skip the
+    cache, and the fake tensors of dynamo export have no data_ptr.
+    """
+    if not self._caching():
+      return build()
+    key = key()
+    value = self._length_cache.get(key)
+    if value is not None:
+      self._length_cache.move_to_end(key)
+      self.cache_hits += 1
+      return value
+    self.cache_misses += 1
+    value = self._length_cache[key] = build()
+    if len(self._length_cache) > self.cache_size:
+      self._length_cache.popitem(last=False)
+    return value
+
+  def _caching(self):
+    return bool(self.cache_size) and not torch.is_grad_enabled() and not _exporting()
+
   def _get_relative_embeddings(self, relative_embeddings, length):
-    max_relative_position = 2 * self.window_size + 1
-    # Pad first before slice to avoid using cond ops.
-    pad_length = max(length - (self.window_size + 1), 0)
-    slice_start_position = max((self.window_size + 1) - length, 0)
-    slice_end_position = slice_start_position + 2 * length - 1
-    if pad_length > 0:
-      padded_relative_embeddings = F.pad(
-          relative_embeddings,
-          commons.convert_pad_shape([[0, 0], [pad_length, pad_length], [0, 0]]))
-    else:
-      padded_relative_embeddings = relative_embeddings
-    used_relative_embeddings = padded_relative_embeddings[:,slice_start_position:slice_end_position]
+    return self._cached(
+        lambda: ('rel', length, relative_embeddings.data_ptr(), relative_embeddings._version,
+                 relative_embeddings.device, relative_embeddings.dtype),
+        lambda: self._pad_relative_embeddings(relative_embeddings, length))
+
+  def _pad_relative_embeddings(self, relative_embeddings, length):
+    # Always pad by length and slice, with no branch or max() on length, so
+    # traced and ONNX graphs stay valid for every sequence length.
+    padded_relative_embeddings = F.pad(
+        relative_embeddings,
+        commons.convert_pad_shape([[0, 0], [length, length], [0, 0]]))
+    used_relative_embeddings = padded_relative_embeddings[:,self.window_size + 1:self.window_size + 2 * length]
     return used_relative_embeddings
 
   def _relative_position_to_absolute_position(self, x):
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_MB = 64
+DEFAULT_DISK_MB = 512
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def checkpoint_digest(path: Path) -> str:
+    """sha256 of a checkpoint file, memoized on (path, mtime, size)."""
+    st = os.stat(path)
+    key = (str(Path(path).resolve()), st.st_mtime_ns, st.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = _digests[key] = h.hexdigest()
+    return digest
+
+
+def make_key(model_digest: str, preset_id: int, phonemes: str, speaker_id: Optional[int],
+             length_scale: float, noise_scale: float, noise_scale_w: float, seed: int) -> str:
+    parts = [model_digest, preset_id, phonemes, speaker_id,
+             length_scale, noise_scale, noise_scale_w, seed]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Two-tier cache of synthesized audio keyed by ``make_key``.
+
+    Recent results live in an in-memory LRU bounded by ``memory_bytes``;
+    every result is also written to ``directory`` as ``<key>.npy`` and the
+    least recently used files are deleted once the directory grows past
+    ``disk_bytes``.  Pass ``directory=None`` for a memory-only cache.
+    """
+
+    def __init__(self, directory: Optional[Path] = None,
+                 memory_bytes: int = DEFAULT_MEMORY_MB * 1024 * 1024,
+                 disk_bytes: int = DEFAULT_DISK_MB * 1024 * 1024) -> None:
+        self.directory = Path(directory) if directory is not None else None
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_size = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._scan_disk()
+
+    def _scan_disk(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.npy"):
+            if path.name.endswith(".tmp.npy"):
+                path.unlink(missing_ok=True)
+                continue
+            st = path.stat()
+            entries.append((st.st_mtime, path.stem, st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.npy"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+            if key in self._disk:
+                try:
+                    audio = np.load(self._path(key))
+                    os.utime(self._path(key))
+                except (OSError, ValueError):
+                    self._drop_disk(key)
+                else:
+                    self._disk.move_to_end(key)
+                    self._remember(key, audio)
+                    self.disk_hits += 1
+                    return audio
+            self.misses += 1
+            return None
+
+    def put(self, key: str, audio: np.ndarray) -> None:
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        with self._lock:
+            self._remember(key, audio)
+            if self.directory is None or key in self._disk:
+                return
+            tmp = self.directory / f"{key}.tmp.npy"
+            try:
+                np.save(tmp, audio)
+                os.replace(tmp, self._path(key))
+            except OSError as exc:
+                logger.warning("Could not write audio cache entry: %s", exc)
+                return
+            self._disk[key] = audio.nbytes
+            self._disk_size += audio.nbytes
+            while len(self._disk) > 1 and self._disk_size > self.disk_bytes:
+                self._drop_disk(next(iter(self._disk)))
+
+    def _remember(self, key: str, audio: np.ndarray) -> None:
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = audio
+        self._memory_size += audio.nbytes
+        while len(self._memory) > 1 and self._memory_size > self.memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= old.nbytes
+
+    def _drop_disk(self, key: str) -> None:
+        self._disk_size -= self._disk.pop(key, 0)
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+            for key in list(self._disk):
+                self._drop_disk(key)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "memory_mb": self._memory_size / (1024 * 1024),
+            "disk_mb": self._disk_size / (1024 * 1024),
+        }
@@ -0,0 +1,203 @@
+"""Headless batch synthesis.
+
+Reads a TSV of ``speaker<TAB>text<TAB>output path`` lines and renders them
+with a pool of worker processes, each holding its own loaded model.  The
+model is loaded once in the parent first, so a bad checkpoint fails before
+any worker starts and ONNX exports or compiled graphs are written once
+rather than raced over by the workers::
+
+    python batch_synthesize.py -c configs/mmj.json -m G_mmj.pth -i lines.tsv -j 4
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+import multiprocessing as mp
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import soundfile as sf
+import torch
+
+import attentions
+import synthesis
+
+logger = logging.getLogger("batch_synthesize")
+
+
+@dataclass(frozen=True)
+class Utterance:
+    index: int
+    speaker: str
+    text: str
+    output: Path
+
+
+@dataclass(frozen=True)
+class SynthesisOptions:
+    config: Path
+    model: Path
+    length_scale: float
+    noise_scale: float
+    noise_scale_w: float
+    threads: int
+    backend: str = "eager"
+    compile_cache: Optional[Path] = None
+    batch_g2p: bool = False
+    attention_block_size: Optional[int] = None
+
+
+# Per-process state set up by _init_worker.
+_model = None
+_preset = None
+_options: Optional[SynthesisOptions] = None
+_init_error: Optional[str] = None
+
+
+class WorkerInitError(RuntimeError):
+    """A pool worker could not load the model; raised to the parent by the first task."""
+
+
+def read_tsv(path: Path) -> List[Utterance]:
+    utterances = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for lineno, row in enumerate(csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE), 1):
+            if not row or row[0].startswith("#"):
+                continue
+            if len(row) != 3:
+                raise ValueError(f"{path}:{lineno}: expected 3 columns, got {len(row)}")
+            speaker, text, output = row
+            utterances.append(Utterance(len(utterances), speaker, text, Path(output)))
+    return utterances
+
+
+def _load(options: SynthesisOptions):
+    preset = synthesis.preset_for_config(options.config.name)
+    model = synthesis.load_model(options.config, options.model, preset)
+    if options.attention_block_size is not None:
+        attentions.set_attention_block_size(model, options.attention_block_size)
+    model = synthesis.wrap_backend(model, options.backend, options.model, options.compile_cache, preset)
+    return preset, model
+
+
+def _prepare(options: SynthesisOptions) -> None:
+    """Load the model once in the parent, writing any backend caches the workers will reuse."""
+    _, model = _load(options)
+    if options.backend == "compiled" and options.compile_cache is not None:
+        model.warm_up()
+
+
+def _init_worker(options: SynthesisOptions) -> None:
+    # An exception escaping a pool initializer makes the pool respawn the
+    # worker forever, so it is kept and reported by the first task instead.
+    global _model, _preset, _options, _init_error
+    try:
+        torch.set_num_threads(options.threads)
+        _options = options
+        _preset, _model = _load(options)
+    except Exception as exc:
+        _init_error = f"{type(exc).__name__}: {exc}"
+
+
+def _synthesize(utt: Utterance) -> Tuple[int, float, Optional[str], float, float]:
+    """Render one line; returns (index, audio seconds, error, start, end).
+
+    start and end are wall-clock timestamps, comparable across workers.
+    """
+    if _init_error is not None:
+        raise WorkerInitError(_init_error)
+    start = time.time()
+    try:
+        sid = synthesis.resolve_speaker(_options.config.name, utt.speaker)
+        stn = synthesis.clean_text(utt.text.replace("\n", " ").strip(), _preset, _options.batch_g2p)
+        audio = synthesis.synthesize(_model, stn, sid,
+                                     length_scale=_options.length_scale,
+                                     noise_scale=_options.noise_scale,
+                                     noise_scale_w=_options.noise_scale_w)
+        utt.output.parent.mkdir(parents=True, exist_ok=True)
+        sf.write(utt.output, audio, synthesis.SAMPLE_RATE)
+        return utt.index, len(audio) / synthesis.SAMPLE_RATE, None, start, time.time()
+    except Exception as exc:
+        return utt.index, 0.0, str(exc), start, time.time()
+
+
+def run(utterances: List[Utterance], options: SynthesisOptions, workers: int) -> int:
+    try:
+        _prepare(options)
+    except Exception as exc:
+        logger.error("Could not load %s: %s", options.model, exc)
+        return len(utterances)
+
+    audio_seconds = 0.0
+    failures = 0
+    first_start, last_end = float("inf"), float("-inf")
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(options,)) as pool:
+        try:
+            results = pool.imap_unordered(_synthesize, utterances)
+            for done, (index, seconds, error, start, end) in enumerate(results, 1):
+                if error is not None:
+                    failures += 1
+                    logger.error("line %d (%s): %s", index + 1, utterances[index].output, error)
+                audio_seconds += seconds
+                first_start, last_end = min(first_start, start), max(last_end, end)
+                if done % 100 == 0:
+                    logger.info("%d/%d done", done, len(utterances))
+        except WorkerInitError as exc:
+            # Leaving the with block terminates the remaining workers.
+            logger.error("A worker could not load the model: %s", exc)
+            return len(utterances)
+    # Pool start-up and model loading are not part of the synthesis time.
+    elapsed = max(last_end - first_start, 0.0)
+
+    succeeded = len(utterances) - failures
+    logger.info("Synthesized %d/%d utterances (%.1f s of audio) in %.2f s",
+                succeeded, len(utterances), audio_seconds, elapsed)
+    logger.info("Throughput: %.2f utt/s, real-time factor %.3f",
+                succeeded / elapsed if elapsed else 0.0,
+                elapsed / audio_seconds if audio_seconds else float("nan"))
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--config", type=Path, required=True, help="model config json")
+    parser.add_argument("-m", "--model", type=Path, required=True, help="G_*.pth checkpoint")
+    parser.add_argument("-i", "--input", type=Path, required=True, help="TSV of speaker, text, output path")
+    parser.add_argument("-j", "--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="number of worker processes")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="torch threads per worker (default: cpu count / workers)")
+    parser.add_argument("--length-scale", type=float, default=1.0)
+    parser.add_argument("--noise-scale", type=float, default=synthesis.NOISE_SCALE)
+    parser.add_argument("--noise-scale-w", type=float, default=synthesis.NOISE_SCALE_W)
+    parser.add_argument("--backend", choices=synthesis.BACKENDS, default="eager", help="inference backend")
+    parser.add_argument("--compile-cache", type=Path, default=None,
+                        help="directory for compiled graphs and ONNX exports")
+    parser.add_argument("--batch-g2p", action="store_true",
+                        help="one OpenJTalk call per run of words; faster, phonemes may differ at word edges")
+    parser.add_argument("--attention-block-size", type=int, default=None,
+                        help="text encoder attention computed this many symbols at a time, bounding memory on "
+                             "long lines (0: dense; default: the config's model.attention_block_size)")
+    args = parser.parse_args(argv)
+
+    utterances = read_tsv(args.input)
+    if not utterances:
+        logger.error("No lines to synthesize in %s", args.input)
+        return 1
+    workers = max(1, min(args.workers, len(utterances)))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    options = SynthesisOptions(args.config, args.model, args.length_scale,
+                               args.noise_scale, args.noise_scale_w, threads,
+                               args.backend, args.compile_cache, args.batch_g2p, args.attention_block_size)
+    logger.info("Rendering %d lines with %d workers x %d threads", len(utterances), workers, threads)
+    return 1 if run(utterances, options, workers) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
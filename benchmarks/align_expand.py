@@ -0,0 +1,101 @@
+"""Time and peak memory of the dense path matmul vs ``commons.expand_by_duration``.
+
+Prior statistics (192 channels each for m_p and logs_p) are expanded by
+random durations averaging ``--frames-per-token`` frames, as
+``SynthesizerTrn.align`` does.  "dense" is the previous implementation:
+``generate_path`` and two matmuls.  Each measurement runs in a fresh
+process so peak RSS belongs to that method alone; both results are
+checked to be identical.
+
+    python benchmarks/align_expand.py --lengths 200 1000 4000
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from memory_usage import peak_rss_mb  # noqa: E402
+
+CHANNELS = 192
+
+
+def _inputs(length, frames_per_token):
+    import torch
+    generator = torch.Generator().manual_seed(length)
+    m_p = torch.randn(1, CHANNELS, length, generator=generator)
+    logs_p = torch.randn(1, CHANNELS, length, generator=generator)
+    w_ceil = torch.randint(0, 2 * frames_per_token + 1, (1, 1, length), generator=generator).float()
+    return m_p, logs_p, w_ceil
+
+
+def _dense(m_p, logs_p, w_ceil):
+    import torch
+    import commons
+    y_lengths = torch.clamp_min(torch.sum(w_ceil, [1, 2]), 1).long()
+    y_mask = torch.unsqueeze(commons.sequence_mask(y_lengths, None), 1).float()
+    x_mask = torch.ones_like(w_ceil)
+    attn = commons.generate_path(w_ceil, torch.unsqueeze(x_mask, 2) * torch.unsqueeze(y_mask, -1))
+    m_p = torch.matmul(attn.squeeze(1), m_p.transpose(1, 2)).transpose(1, 2)
+    logs_p = torch.matmul(attn.squeeze(1), logs_p.transpose(1, 2)).transpose(1, 2)
+    return torch.cat([m_p, logs_p], 1)
+
+
+def _gather(m_p, logs_p, w_ceil):
+    import torch
+    import commons
+    t_y = max(int(w_ceil.sum()), 1)
+    return commons.expand_by_duration(torch.cat([m_p, logs_p], 1), w_ceil, t_y)
+
+
+def _child(method, length, frames_per_token, runs):
+    import torch
+    fn = _dense if method == "dense" else _gather
+    inputs = _inputs(length, frames_per_token)
+    before = peak_rss_mb()
+    times = []
+    with torch.no_grad():
+        for _ in range(runs):
+            start = time.perf_counter()
+            out = fn(*inputs)
+            times.append(time.perf_counter() - start)
+    print(json.dumps({"ms": statistics.median(times) * 1000, "peak_mb": peak_rss_mb() - before,
+                      "frames": out.size(2), "checksum": out.double().sum().item()}))
+
+
+def _measure(method, length, frames_per_token, runs):
+    out = subprocess.run([sys.executable, __file__, "--child", method, str(length), str(frames_per_token), str(runs)],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[200, 500, 1000, 2000, 4000],
+                        help="input symbols per utterance")
+    parser.add_argument("--frames-per-token", type=int, default=6)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        method, length, frames_per_token, runs = args.child
+        _child(method, int(length), int(frames_per_token), int(runs))
+        return 0
+
+    print(f"{'symbols':>8}{'frames':>8}{'dense ms':>10}{'gather ms':>11}{'dense MB':>10}{'gather MB':>11}{'match':>7}")
+    for length in args.lengths:
+        dense = _measure("dense", length, args.frames_per_token, args.runs)
+        gather = _measure("gather", length, args.frames_per_token, args.runs)
+        match = dense["frames"] == gather["frames"] and dense["checksum"] == gather["checksum"]
+        print(f"{length:>8}{dense['frames']:>8}{dense['ms']:>10.2f}{gather['ms']:>11.2f}"
+              f"{dense['peak_mb']:>10.1f}{gather['peak_mb']:>11.1f}{'yes' if match else 'NO':>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Effect of the per-length attention caches on repeated inference.
+
+A batch of lines with a handful of distinct lengths, as in a script of
+similar-length dialogue, is synthesized with the caches disabled and then
+enabled.  The text encoder time and the cache counters are reported; every
+hit is a padded relative-embedding tensor that was not allocated again.
+
+    python benchmarks/attention_cache.py -c configs/mmj.json -m G_mmj.pth --lines 200
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import torch  # noqa: E402
+
+import attentions  # noqa: E402
+import synthesis  # noqa: E402
+import utils  # noqa: E402
+
+LENGTHS = (36, 40, 44, 48, 52, 56)
+
+
+def _encode_all(model, inputs):
+    start = time.perf_counter()
+    with torch.no_grad():
+        for x, x_lengths, _ in inputs:
+            model.enc_p(x, x_lengths)
+    return time.perf_counter() - start
+
+
+def _set_cache_size(model, size):
+    for module in model.modules():
+        if isinstance(module, attentions.MultiHeadAttention):
+            module.cache_size = size
+            module._length_cache.clear()
+            module.cache_hits = module.cache_misses = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--config", type=Path, required=True, help="model config json")
+    parser.add_argument("-m", "--model", type=Path, default=None, help="G_*.pth checkpoint (random weights if omitted)")
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    if args.model is not None:
+        model = synthesis.load_model(args.config, args.model)
+    else:
+        hps = utils.get_hparams_from_file(str(args.config))
+        preset = synthesis.preset_for_config(args.config.name)
+        model = synthesis.build_model(hps, preset, inference_only=True).prepare_for_inference()
+    inputs = [synthesis.check_inputs(model, LENGTHS[i % len(LENGTHS)]) for i in range(args.lines)]
+
+    print(f"{'cache':>8}{'encoder ms':>12}{'hits':>8}{'misses':>8}{'entries':>9}")
+    for label, size in (("off", 0), ("on", attentions.LENGTH_CACHE_SIZE)):
+        _set_cache_size(model, size)
+        elapsed = _encode_all(model, inputs)
+        stats = attentions.cache_stats(model)
+        print(f"{label:>8}{elapsed * 1000:>12.1f}{stats['hits']:>8}{stats['misses']:>8}{stats['entries']:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
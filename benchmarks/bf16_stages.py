@@ -0,0 +1,113 @@
+"""Speed and error of bfloat16 autocast against float32, per inference stage.
+
+Each stage of ``infer`` (text encoder, duration predictor, reverse flow,
+decoder) gets the float32 reference inputs and runs in float32 and under
+bfloat16 autocast, so its error is its own and not inherited from the
+stage before.  Error is the relative L2 distance to the float32 output;
+for the duration predictor it is the number of frames whose duration
+changed.  The last row is the whole of ``infer`` with the same seed, with
+the audio SNR in dB.
+
+    python benchmarks/bf16_stages.py -c configs/mmj.json -m G_mmj.pth --threads 4
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import torch  # noqa: E402
+
+import mixed_precision  # noqa: E402
+import synthesis  # noqa: E402
+import utils  # noqa: E402
+
+
+def _timed(fn, runs, autocast):
+    times = []
+    with torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=autocast):
+        for _ in range(runs + 1):
+            torch.manual_seed(0)
+            start = time.perf_counter()
+            out = fn()
+            times.append(time.perf_counter() - start)
+    return out, statistics.median(times[1:])
+
+
+def _relative_error(actual, expected):
+    return ((actual.float() - expected).norm() / expected.norm().clamp_min(1e-12)).item()
+
+
+def _stages(model, x, x_lengths, sid):
+    """(name, fn, error) for each stage, with inputs taken from a float32 run."""
+    with torch.no_grad():
+        torch.manual_seed(0)
+        g = model.speaker_embedding(sid)
+        h, m_p, logs_p, x_mask = model.enc_p(x, x_lengths)
+        noise_w = torch.randn(x.size(0), 2, x.size(1))
+        _, _, _, logw = model.infer_durations(x, x_lengths, g=g, noise_w=noise_w)
+        _, y_mask, m_p, logs_p = model.align(m_p, logs_p, x_mask, logw)
+        z_p = m_p + torch.randn_like(m_p) * torch.exp(logs_p)
+        z = model.flow(z_p, y_mask, g=g, reverse=True)
+
+    def durations(logw):
+        return torch.ceil(torch.exp(logw.float()) * x_mask)
+
+    def dp():
+        if model.use_sdp:
+            return model.dp(h, x_mask, g=g, reverse=True, noise=noise_w)
+        return model.dp(h, x_mask, g=g)
+
+    return [
+        ("text encoder", lambda: model.enc_p(x, x_lengths)[1], _relative_error),
+        ("duration", dp, lambda a, e: (durations(a) != durations(e)).sum().item()),
+        ("flow", lambda: model.flow(z_p, y_mask, g=g, reverse=True), _relative_error),
+        ("decoder", lambda: model.dec(z * y_mask, g=g), _relative_error),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--config", type=Path, required=True, help="model config json")
+    parser.add_argument("-m", "--model", type=Path, default=None, help="G_*.pth checkpoint (random weights if omitted)")
+    parser.add_argument("--length", type=int, default=120, help="input symbols per utterance")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if not mixed_precision.bf16_supported():
+        print("warning: no native bfloat16 kernels on this CPU, timings are for emulated bf16")
+
+    if args.model is not None:
+        model = synthesis.load_model(args.config, args.model)
+    else:
+        hps = utils.get_hparams_from_file(str(args.config))
+        preset = synthesis.preset_for_config(args.config.name)
+        model = synthesis.build_model(hps, preset, inference_only=True).prepare_for_inference()
+    x, x_lengths, sid = synthesis.check_inputs(model, args.length)
+
+    print(f"{'stage':<14}{'fp32 ms':>10}{'bf16 ms':>10}{'speedup':>9}{'error':>12}")
+    for name, fn, error in _stages(model, x, x_lengths, sid):
+        expected, before = _timed(fn, args.runs, False)
+        actual, after = _timed(fn, args.runs, True)
+        print(f"{name:<14}{before * 1000:>10.1f}{after * 1000:>10.1f}{before / after:>8.2f}x"
+              f"{error(actual, expected):>12.3g}")
+
+    wrapped = mixed_precision.Bf16Synthesizer(model)
+    expected, before = _timed(lambda: model.infer(x, x_lengths, sid=sid)[0], args.runs, False)
+    actual, after = _timed(lambda: wrapped.infer(x, x_lengths, sid=sid)[0], args.runs, False)
+    if actual.shape == expected.shape:
+        snr = 10 * torch.log10(expected.pow(2).sum() / (actual - expected).pow(2).sum().clamp_min(1e-12))
+        quality = f"{snr.item():.1f} dB"
+    else:
+        quality = f"len {actual.size(-1) - expected.size(-1):+d}"
+    print(f"{'infer':<14}{before * 1000:>10.1f}{after * 1000:>10.1f}{before / after:>8.2f}x{quality:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
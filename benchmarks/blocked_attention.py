@@ -0,0 +1,96 @@
+"""Time, peak memory and parity of blocked vs dense text-encoder attention.
+
+A randomly initialized text encoder stack (the shape every config in
+configs/ uses) encodes random inputs of each length, once with the dense
+``[b, h, t, t]`` attention and once with ``attention_block_size`` set.  Each
+timing runs in a fresh process so peak RSS belongs to that mode alone; the
+max difference between the two outputs is computed in this process.
+
+    python benchmarks/blocked_attention.py --lengths 500 2000 4000 --block-size 128
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from memory_usage import peak_rss_mb  # noqa: E402
+
+HIDDEN, FILTER, HEADS, LAYERS, KERNEL = 192, 768, 2, 6, 3
+
+
+def _encoder(block_size):
+    import torch
+    import attentions
+    torch.manual_seed(0)
+    encoder = attentions.Encoder(HIDDEN, FILTER, HEADS, LAYERS, KERNEL, 0.0, attention_block_size=block_size)
+    return encoder.eval()
+
+
+def _inputs(length):
+    import torch
+    generator = torch.Generator().manual_seed(length)
+    x = torch.randn(1, HIDDEN, length, generator=generator)
+    x_mask = torch.ones(1, 1, length)
+    return x, x_mask
+
+
+def _child(length, block_size, runs):
+    import torch
+    encoder = _encoder(block_size or None)
+    x, x_mask = _inputs(length)
+    before = peak_rss_mb()
+    times = []
+    with torch.no_grad():
+        for _ in range(runs):
+            start = time.perf_counter()
+            encoder(x, x_mask)
+            times.append(time.perf_counter() - start)
+    print(json.dumps({"ms": statistics.median(times) * 1000, "peak_mb": peak_rss_mb() - before}))
+
+
+def _measure(length, block_size, runs):
+    out = subprocess.run([sys.executable, __file__, "--child", str(length), str(block_size), str(runs)],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _max_diff(length, block_size):
+    import torch
+    x, x_mask = _inputs(length)
+    with torch.no_grad():
+        expected = _encoder(None)(x, x_mask)
+        actual = _encoder(block_size)(x, x_mask)
+    return (actual - expected).abs().max().item()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[250, 500, 1000, 2000, 4000],
+                        help="input symbols per utterance")
+    parser.add_argument("--block-size", type=int, default=128)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        length, block_size, runs = (int(v) for v in args.child)
+        _child(length, block_size, runs)
+        return 0
+
+    print(f"{'symbols':>8}{'dense ms':>10}{'block ms':>10}{'dense MB':>10}{'block MB':>10}{'max diff':>10}")
+    for length in args.lengths:
+        dense = _measure(length, 0, args.runs)
+        blocked = _measure(length, args.block_size, args.runs)
+        diff = _max_diff(length, args.block_size)
+        print(f"{length:>8}{dense['ms']:>10.1f}{blocked['ms']:>10.1f}"
+              f"{dense['peak_mb']:>10.1f}{blocked['peak_mb']:>10.1f}{diff:>10.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Latency of the compiled (TorchScript) or ONNX backend against eager ``infer``.
+
+For each input length the model runs eagerly and through the chosen
+backend with the same seed.  The first backend call per length pays for
+tracing (or loading from ``--cache``) and is reported separately; the rest
+are medians over ``--runs``.
+
+    python benchmarks/compiled_infer.py -c configs/mmj.json -m G_mmj.pth --cache /tmp/vits-graphs
+    python benchmarks/compiled_infer.py -c configs/mmj.json -m G_mmj.pth --backend onnx
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import torch  # noqa: E402
+
+import synthesis  # noqa: E402
+
+LENGTHS = (20, 50, 100, 200, 400)
+
+
+def _timed(model, inputs, runs):
+    x, x_lengths, sid = inputs
+    times = []
+    with torch.no_grad():
+        for _ in range(runs):
+            torch.manual_seed(0)
+            start = time.perf_counter()
+            audio = model.infer(x, x_lengths, sid=sid)[0]
+            times.append(time.perf_counter() - start)
+    return audio, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--config", type=Path, required=True, help="model config json")
+    parser.add_argument("-m", "--model", type=Path, required=True, help="G_*.pth checkpoint")
+    parser.add_argument("--backend", choices=["compiled", "onnx"], default="compiled")
+    parser.add_argument("--cache", type=Path, default=None, help="directory for traced graphs and ONNX exports")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    model = synthesis.load_model(args.config, args.model)
+    compiled = synthesis.wrap_backend(model, args.backend, args.model, args.cache)
+    print(f"{'symbols':>8}{'eager ms':>10}{'first ms':>10}{args.backend + ' ms':>13}{'speedup':>9}{'max diff':>10}")
+    for length in LENGTHS:
+        inputs = synthesis.check_inputs(model, length)
+        expected, eager = _timed(model, inputs, args.runs)
+        actual, times = _timed(compiled, inputs, args.runs + 1)
+        n = min(expected.size(-1), actual.size(-1))
+        diff = (expected[..., :n] - actual[..., :n]).abs().max().item()
+        before, after = statistics.median(eager), statistics.median(times[1:])
+        print(f"{length:>8}{before * 1000:>10.1f}{times[0] * 1000:>10.1f}{after * 1000:>13.1f}"
+              f"{before / after:>8.2f}x{diff:>10.2e}")
+    if hasattr(compiled, "stats"):
+        print("engine:", compiled.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Load time and memory for every config in configs/, with and without mmap.
+
+For each config the checkpoint ``<checkpoints>/G_<config stem>.pth`` is used
+when it exists; otherwise a randomly initialised checkpoint of the same
+shape is written to a temporary directory.  Every load runs in a fresh
+process and reports
+
+* ``load``    - seconds spent in ``synthesis.load_model``
+* ``peak``    - growth of peak RSS during the load
+* ``private`` - anonymous memory after the load, paid by every process
+* ``shared``  - file-backed memory after the load, shared through the page cache
+
+Folding weight norm computes the decoder and flow conv weights anew, so
+those land in ``private`` even with mmap; only the rest stays ``shared``.
+Exports from export_model.py are stored folded and stay ``shared`` whole.
+
+    python benchmarks/config_load_report.py --checkpoints models/
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from memory_usage import peak_rss_mb, rss_breakdown_mb  # noqa: E402
+
+
+def _memory_mb():
+    return {"peak": peak_rss_mb(), **rss_breakdown_mb()}
+
+
+def _child(config, model_path, mmap):
+    import synthesis
+    before = _memory_mb()
+    start = time.perf_counter()
+    model = synthesis.load_model(Path(config), Path(model_path), mmap=mmap)
+    seconds = time.perf_counter() - start
+    # Touch every weight, as a first synthesis would.
+    sum(float(p.sum()) for p in model.parameters())
+    after = _memory_mb()
+    print(json.dumps({"load": seconds, "peak": after["peak"] - before["peak"],
+                      "private": after.get("RssAnon", 0) - before.get("RssAnon", 0),
+                      "shared": after.get("RssFile", 0) - before.get("RssFile", 0)}))
+
+
+def _random_checkpoint(config, out_path):
+    import torch
+    import synthesis
+    import utils
+    hps = utils.get_hparams_from_file(str(config))
+    model = synthesis.build_model(hps, synthesis.preset_for_config(config.name))
+    torch.save({"model": model.state_dict(), "iteration": 0, "learning_rate": 0.0, "optimizer": None}, out_path)
+
+
+def _measure(config, model_path, mmap):
+    out = subprocess.run([sys.executable, __file__, "--child", str(config), str(model_path), str(int(mmap))],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", type=Path, default=ROOT / "configs")
+    parser.add_argument("--checkpoints", type=Path, default=None, help="directory holding G_<config>.pth files")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        config, model_path, mmap = args.child
+        _child(config, model_path, mmap == "1")
+        return 0
+
+    print(f"{'config':<16}{'source':>8}{'mode':>6}{'load s':>9}{'peak MB':>9}{'private MB':>12}{'shared MB':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for config in sorted(args.configs.glob("*.json")):
+            model_path = args.checkpoints / f"G_{config.stem}.pth" if args.checkpoints else None
+            source = "ckpt"
+            if model_path is None or not model_path.exists():
+                model_path = Path(tmp) / f"G_{config.stem}.pth"
+                _random_checkpoint(config, model_path)
+                source = "random"
+            for mmap in (False, True):
+                r = _measure(config, model_path, mmap)
+                print(f"{config.stem:<16}{source:>8}{'mmap' if mmap else 'read':>6}{r['load']:>9.3f}"
+                      f"{r['peak']:>9.1f}{r['private']:>12.1f}{r['shared']:>11.1f}")
+            if source == "random":
+                model_path.unlink()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Throughput of japanese_tokenization_cleaners with and without batched G2P.
+
+Janome tokenization is warmed up first and the G2P memo is cleared before
+every pass, so the timings cover OpenJTalk and the cleaner itself.  Lines
+whose output differs between the two modes are listed; this happens when
+OpenJTalk devoices a vowel differently once it sees neighbouring words.
+
+    python benchmarks/g2p_batch.py --repeat 20
+    python benchmarks/g2p_batch.py --corpus lines.txt
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pyopenjtalk  # noqa: E402
+
+from text import cleaners  # noqa: E402
+
+CORPUS = [
+    "今日はいい天気ですね。",
+    "セカイはまだ始まってすらいない。",
+    "明日の練習は何時からだっけ？",
+    "みんなで一緒にステージに立てるのが、本当に嬉しいんだ。",
+    "ちょっと待って、まだ準備ができてないよ！",
+    "新しい曲の歌詞を考えてたら、いつの間にか朝になってた。",
+    "私たちの想いを、音楽に乗せて届けたいんです。",
+    "ライブが終わったら、みんなでファミレスに行こうよ。",
+    "もう一度最初から通してみよう、今度はテンポを少し上げて。",
+    "ショーの準備はばっちりだ、あとは観客を待つだけだな。",
+]
+
+_calls = 0
+_g2p = pyopenjtalk.g2p
+
+
+def _counting_g2p(*args, **kwargs):
+    global _calls
+    _calls += 1
+    return _g2p(*args, **kwargs)
+
+
+def _run(lines, repeat, batch_g2p):
+    global _calls
+    _calls = 0
+    elapsed = 0.0
+    for _ in range(repeat):
+        cleaners._g2p.clear()
+        start = time.perf_counter()
+        outputs = [cleaners.japanese_tokenization_cleaners(line, batch_g2p=batch_g2p) for line in lines]
+        elapsed += time.perf_counter() - start
+    return outputs, len(lines) * repeat / elapsed, _calls / (len(lines) * repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="UTF-8 text file, one line per utterance")
+    parser.add_argument("--repeat", type=int, default=10, help="passes over the corpus")
+    args = parser.parse_args()
+
+    lines = CORPUS
+    if args.corpus:
+        lines = [line.strip() for line in args.corpus.read_text(encoding="utf-8").splitlines() if line.strip()]
+    for line in lines:
+        cleaners._tokenize(line)
+    pyopenjtalk.g2p = _counting_g2p
+
+    per_word, before, calls_before = _run(lines, args.repeat, batch_g2p=False)
+    batched, after, calls_after = _run(lines, args.repeat, batch_g2p=True)
+    print(f"per word: {before:,.1f} lines/s, {calls_before:.1f} OpenJTalk calls/line")
+    print(f"batched:  {after:,.1f} lines/s, {calls_after:.1f} OpenJTalk calls/line ({after / before:.2f}x)")
+    differing = [(line, a, b) for line, a, b in zip(lines, per_word, batched) if a != b]
+    print(f"{len(differing)} of {len(lines)} lines differ")
+    for line, a, b in differing:
+        print(f"  {line}\n    per word {a}\n    batched  {b}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
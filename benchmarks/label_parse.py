@@ -0,0 +1,84 @@
+"""Throughput of the full-context label parser used by the accent cleaners.
+
+Labels for a few sentences are extracted once with pyopenjtalk, then turned
+into accented romaji both by the previous per-field ``re.search`` loop and
+by ``text.fullcontext``.  Outputs must match; labels/s is printed for each.
+
+    python benchmarks/label_parse.py --repeat 2000
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from text.fullcontext import labels_to_romaji_with_accent  # noqa: E402
+
+SAMPLE = [
+    "今日はいい天気ですね",
+    "セカイはまだ始まってすらいない",
+    "明日の練習は何時からだっけ",
+    "みんなで一緒にステージに立てるのが本当に嬉しいんだ",
+    "ちょっと待って、まだ準備ができてないよ",
+]
+
+
+def reference(labels):
+    """The per-label parser the cleaners used before text.fullcontext."""
+    text = ''
+    for n, label in enumerate(labels):
+        phoneme = re.search(r'\-([^\+]*)\+', label).group(1)
+        if phoneme not in ['sil', 'pau']:
+            text += phoneme.replace('ch', 'ʧ').replace('sh', 'ʃ').replace('cl', 'Q')
+        else:
+            continue
+        n_moras = int(re.search(r'/F:(\d+)_', label).group(1))
+        a1 = int(re.search(r"/A:(\-?[0-9]+)\+", label).group(1))
+        a2 = int(re.search(r"\+(\d+)\+", label).group(1))
+        a3 = int(re.search(r"\+(\d+)/", label).group(1))
+        if re.search(r'\-([^\+]*)\+', labels[n + 1]).group(1) in ['sil', 'pau']:
+            a2_next = -1
+        else:
+            a2_next = int(re.search(r"\+(\d+)\+", labels[n + 1]).group(1))
+        if a3 == 1 and a2_next == 1:
+            text += ' '
+        elif a1 == 0 and a2_next == a2 + 1 and a2 != n_moras:
+            text += '↓'
+        elif a2 == 1 and a2_next == 2:
+            text += '↑'
+    return text
+
+
+def _rate(func, corpus, repeat):
+    n_labels = sum(len(labels) for labels in corpus) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for labels in corpus:
+            func(labels)
+    return n_labels / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=1000, help="passes over the sample sentences")
+    args = parser.parse_args()
+
+    import pyopenjtalk
+    corpus = [pyopenjtalk.extract_fullcontext(sentence) for sentence in SAMPLE]
+    for labels in corpus:
+        expected, actual = reference(labels), labels_to_romaji_with_accent(labels)
+        if expected != actual:
+            print(f"output mismatch:\n  reference   {expected}\n  single-pass {actual}")
+            return 1
+
+    before = _rate(reference, corpus, args.repeat)
+    after = _rate(labels_to_romaji_with_accent, corpus, args.repeat)
+    print(f"per-field re.search: {before:,.0f} labels/s")
+    print(f"single pass:         {after:,.0f} labels/s ({after / before:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Load time and peak memory of a training checkpoint vs its inference export.
+
+Each load runs in a fresh process, so peak RSS is not polluted by earlier
+loads.  The checkpoint's conv weights are recomputed by the weight norm fold
+on every load, so its peak includes them whether or not the file is mapped;
+the export is stored folded and its float32 weights stay mapped.  Without ``--export`` the checkpoint is exported to a temporary file
+first.
+
+    python benchmarks/model_load.py -c configs/mmj.json -m G_mmj.pth --fp16
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from memory_usage import peak_rss_mb  # noqa: E402
+
+
+def _child(config, model_path):
+    import synthesis
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    synthesis.load_model(Path(config), Path(model_path))
+    print(json.dumps({"seconds": time.perf_counter() - start,
+                      "peak_mb": peak_rss_mb() - before}))
+
+
+def _measure(config, model_path, runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, __file__, "--child", str(config), str(model_path)],
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(r["seconds"] for r in results), min(r["peak_mb"] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--config", type=Path, help="model config json")
+    parser.add_argument("-m", "--model", type=Path, help="G_*.pth checkpoint")
+    parser.add_argument("-e", "--export", type=Path, help="existing export of the checkpoint")
+    parser.add_argument("--fp16", action="store_true", help="export with float16 weights")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(*args.child)
+        return 0
+    if not (args.config and args.model):
+        parser.error("-c and -m are required")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        export_path = args.export
+        if export_path is None:
+            import export_model
+            export_path = Path(tmp) / "model.infer.pth"
+            export_model.export(args.config, args.model, export_path, half=args.fp16)
+        for label, path in (("checkpoint", args.model), ("export", export_path)):
+            seconds, peak = _measure(args.config, path, args.runs)
+            print(f"{label:>10}: {path.stat().st_size / 2 ** 20:7.1f} MB on disk, "
+                  f"load {seconds:.3f}s, peak RSS +{peak:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Real-time factor and spectral distance of int8 vs float models, per config.
+
+Every config in configs/ is loaded (``G_<config stem>.pth`` from
+``--checkpoints`` when present, random weights otherwise), quantized with
+``synthesis.quantize`` and run on sentences that are not part of the
+calibration set.  Float and int8 use the same seed, so the outputs line
+up sample for sample.  Spectral distance is the log-spectral distance in dB:
+the RMS over frequency of the difference of the log power spectra, averaged
+over frames.
+
+    python benchmarks/quantization_report.py --checkpoints models/ --threads 4
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import torch  # noqa: E402
+
+import synthesis  # noqa: E402
+import utils  # noqa: E402
+
+EVAL_TEXTS = [
+    "雨が降りそうだから、傘を持っていったほうがいいよ。",
+    "この曲、サビのところがすごく好きなんだ。",
+    "次のイベントまで、あと一週間しかない！",
+    "少し休憩してから、もう一回合わせてみようか。",
+]
+
+
+def log_spectral_distance(reference, test, n_fft=1024, hop_length=256):
+    window = torch.hann_window(n_fft)
+    spectra = [torch.stft(torch.as_tensor(a), n_fft, hop_length, window=window, return_complex=True)
+               .abs().pow(2).clamp_min(1e-10) for a in (reference, test)]
+    diff = 10 * torch.log10(spectra[0] / spectra[1])
+    return diff.pow(2).mean(0).sqrt().mean().item()
+
+
+def _run(model, inputs):
+    audios, elapsed = [], 0.0
+    for stn, sid in inputs:
+        start = time.perf_counter()
+        audios.append(synthesis.synthesize(model, stn, sid, seed=0))
+        elapsed += time.perf_counter() - start
+    seconds = sum(len(a) for a in audios) / synthesis.SAMPLE_RATE
+    return audios, elapsed / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", type=Path, default=ROOT / "configs")
+    parser.add_argument("--checkpoints", type=Path, default=None, help="directory holding G_<config>.pth files")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    print(f"{'config':<16}{'source':>8}{'float RTF':>11}{'int8 RTF':>10}{'speedup':>9}{'LSD dB':>8}")
+    for config in sorted(args.configs.glob("*.json")):
+        preset = synthesis.preset_for_config(config.name)
+        model_path = args.checkpoints / f"G_{config.stem}.pth" if args.checkpoints else None
+        if model_path is not None and model_path.exists():
+            model, source = synthesis.load_model(config, model_path, preset), "ckpt"
+        else:
+            hps = utils.get_hparams_from_file(str(config))
+            model = synthesis.build_model(hps, preset, inference_only=True).prepare_for_inference()
+            source = "random"
+        quantized = synthesis.quantize(model, preset)
+
+        sid = 0 if hasattr(model, "emb_g") else None
+        inputs = [(synthesis.clean_text(text, preset), sid) for text in EVAL_TEXTS]
+        reference, float_rtf = _run(model, inputs)
+        test, int8_rtf = _run(quantized, inputs)
+        lsd = sum(log_spectral_distance(a, b) for a, b in zip(reference, test)) / len(inputs)
+        print(f"{config.stem:<16}{source:>8}{float_rtf:>11.3f}{int8_rtf:>10.3f}"
+              f"{float_rtf / int8_rtf:>8.2f}x{lsd:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Per-call cost of speaker conditioning with and without the per-speaker cache.
+
+For every multi-speaker config in configs/ (``G_<config stem>.pth`` from
+``--checkpoints`` when present, random weights otherwise), short lines are
+synthesized round-robin over all speakers with
+``cache_speaker_conditioning`` off and on, using the same seeds.  Reported
+are the mean ``infer`` time per line, the time spent on the conditioning
+projections (computed, or looked up in the cache), and the max output
+difference between the two runs.
+
+    python benchmarks/speaker_conditioning.py --checkpoints models/ --lines 100
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import torch  # noqa: E402
+
+import synthesis  # noqa: E402
+import utils  # noqa: E402
+
+
+def _project(model, sid):
+    # What infer computes per call without the cache.
+    g = model.speaker_embedding(sid)
+    model.dp.cond(g)
+    for flow in model.flow.flows:
+        if hasattr(flow, "enc"):
+            flow.enc.cond_layer(g)
+    model.dec.cond(g)
+
+
+def _run(model, inputs, cached):
+    model.cache_speaker_conditioning = cached
+    conditioning = model.speaker_conditioning if cached else lambda sid: _project(model, sid)
+    outputs, infer_time, cond_time = [], 0.0, 0.0
+    with torch.no_grad():
+        for seed, (x, x_lengths, sid) in enumerate(inputs):
+            start = time.perf_counter()
+            conditioning(sid)
+            cond_time += time.perf_counter() - start
+            torch.manual_seed(seed)
+            start = time.perf_counter()
+            outputs.append(model.infer(x, x_lengths, sid=sid)[0])
+            infer_time += time.perf_counter() - start
+    return outputs, infer_time / len(inputs), cond_time / len(inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", type=Path, default=ROOT / "configs")
+    parser.add_argument("--checkpoints", type=Path, default=None, help="directory holding G_<config>.pth files")
+    parser.add_argument("--length", type=int, default=24, help="input symbols per line")
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    print(f"{'config':<16}{'speakers':>9}{'infer ms':>10}{'cached ms':>11}{'cond us':>9}{'cached us':>11}{'max diff':>10}")
+    for config in sorted(args.configs.glob("*.json")):
+        hps = utils.get_hparams_from_file(str(config))
+        if hps.data.n_speakers <= 1:
+            continue
+        model_path = args.checkpoints / f"G_{config.stem}.pth" if args.checkpoints else None
+        if model_path is not None and model_path.exists():
+            model = synthesis.load_model(config, model_path)
+        else:
+            preset = synthesis.preset_for_config(config.name)
+            model = synthesis.build_model(hps, preset, inference_only=True).prepare_for_inference()
+
+        x, x_lengths, _ = synthesis.check_inputs(model, args.length)
+        inputs = [(x, x_lengths, torch.LongTensor([i % model.n_speakers])) for i in range(args.lines)]
+        expected, before, cond_before = _run(model, inputs, False)
+        actual, after, cond_after = _run(model, inputs, True)
+        diff = max((a - e).abs().max().item() for a, e in zip(actual, expected))
+        print(f"{config.stem:<16}{model.n_speakers:>9}{before * 1000:>10.2f}{after * 1000:>11.2f}"
+              f"{cond_before * 1e6:>9.0f}{cond_after * 1e6:>11.0f}{diff:>10.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Startup-time benchmark for the GUI.
+
+Each run starts a fresh interpreter that imports ``PJSK-MultiGUI.py``,
+builds and shows the window, and records
+
+* ``import``      - time to import the GUI module (everything before the window)
+* ``first_paint`` - time from process start until the window first paints
+* ``warm_up``     - time the worker spent importing torch/models/cleaners
+* ``ready``       - time from process start until the worker finished warming up
+
+Medians over ``--runs`` are printed; ``--max-first-paint`` turns the run
+into a regression check that fails when the window takes longer to appear.
+
+    python benchmarks/startup.py --runs 5 --max-first-paint 1.5
+"""
+import time
+
+_T0 = time.perf_counter()
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _child(timeout: float) -> None:
+    sys.path.insert(0, str(ROOT))
+    spec = importlib.util.spec_from_file_location("pjsk_multigui", ROOT / "PJSK-MultiGUI.py")
+    gui = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(gui)
+    result = {"import": time.perf_counter() - _T0}
+
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication([])
+    window = gui.Window()
+
+    def painted():
+        result["first_paint"] = time.perf_counter() - _T0
+
+    def ready(seconds):
+        result["warm_up"] = seconds
+        result["ready"] = time.perf_counter() - _T0
+        app.quit()
+
+    window.first_painted.connect(painted)
+    window.service.worker.ready.connect(ready)
+    window.show()
+    QTimer.singleShot(int(timeout * 1000), app.quit)
+    app.exec()
+    window.service.shutdown()
+    print(json.dumps(result))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure GUI import and first-paint time")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for warm-up per run")
+    parser.add_argument("--max-first-paint", type=float, default=None,
+                        help="fail if the median first paint is slower than this many seconds")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.timeout)
+        return 0
+
+    runs = []
+    for i in range(args.runs):
+        out = subprocess.run([sys.executable, __file__, "--child", "--timeout", str(args.timeout)],
+                             env=dict(os.environ), capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        print(f"run {i + 1}: " + ", ".join(f"{k} {v:.3f}s" for k, v in runs[-1].items()))
+
+    medians = {k: statistics.median(r[k] for r in runs if k in r) for k in runs[0]}
+    print("median: " + ", ".join(f"{k} {v:.3f}s" for k, v in medians.items()))
+    if args.max_first_paint is not None and medians.get("first_paint", float("inf")) > args.max_first_paint:
+        print(f"first paint {medians.get('first_paint', float('nan')):.3f}s exceeds {args.max_first_paint:.3f}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
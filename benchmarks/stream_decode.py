@@ -0,0 +1,77 @@
+"""Check streamed decoding against one-shot ``infer`` and time the first chunk.
+
+For each input length the model runs ``infer`` and ``infer_stream`` with
+the same seed.  The joined chunks must match the one-shot audio within
+``--atol``; the script exits non-zero otherwise.  Time to first chunk is
+what a player waits before it can start, against the full ``infer``.
+
+    python benchmarks/stream_decode.py -c configs/mmj.json -m G_mmj.pth --chunk-frames 32
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import torch  # noqa: E402
+
+import synthesis  # noqa: E402
+import utils  # noqa: E402
+
+LENGTHS = (20, 50, 100, 200, 400)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--config", type=Path, required=True, help="model config json")
+    parser.add_argument("-m", "--model", type=Path, default=None, help="G_*.pth checkpoint (random weights if omitted)")
+    parser.add_argument("--chunk-frames", type=int, default=32)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    if args.model is not None:
+        model = synthesis.load_model(args.config, args.model)
+    else:
+        hps = utils.get_hparams_from_file(str(args.config))
+        preset = synthesis.preset_for_config(args.config.name)
+        model = synthesis.build_model(hps, preset, inference_only=True).prepare_for_inference()
+    print(f"context: {model.dec.context_frames} frames per side, chunk: {args.chunk_frames} frames")
+
+    failed = False
+    print(f"{'symbols':>8}{'chunks':>8}{'infer ms':>10}{'first ms':>10}{'stream ms':>11}{'max diff':>10}")
+    for length in LENGTHS:
+        x, x_lengths, sid = synthesis.check_inputs(model, length)
+        with torch.no_grad():
+            torch.manual_seed(0)
+            start = time.perf_counter()
+            expected = model.infer(x, x_lengths, sid=sid)[0]
+            one_shot = time.perf_counter() - start
+
+            torch.manual_seed(0)
+            chunks, first = [], None
+            start = time.perf_counter()
+            for chunk in model.infer_stream(x, x_lengths, sid=sid, chunk_frames=args.chunk_frames):
+                chunks.append(chunk)
+                if first is None:
+                    first = time.perf_counter() - start
+            streamed = time.perf_counter() - start
+        actual = torch.cat(chunks, dim=2)
+        if actual.shape != expected.shape:
+            diff = float("inf")
+        else:
+            diff = (actual - expected).abs().max().item()
+        failed |= diff > args.atol
+        print(f"{length:>8}{len(chunks):>8}{one_shot * 1000:>10.1f}{first * 1000:>10.1f}"
+              f"{streamed * 1000:>11.1f}{diff:>10.2e}")
+    if failed:
+        print(f"streamed audio differs from infer by more than {args.atol}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
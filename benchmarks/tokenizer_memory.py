@@ -0,0 +1,67 @@
+"""Resident memory of the Janome tokenizer with and without mmap.
+
+Each mode runs in a fresh process that builds ``Tokenizer(mmap=...)`` and
+tokenizes a few lines.  Private (anonymous) memory is what every worker
+process pays on its own; file-backed pages of the mapped dictionary live
+in the page cache and are shared by every process mapping the same file.
+
+    python benchmarks/tokenizer_memory.py
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+SAMPLE = [
+    "今日はいい天気ですね。",
+    "セカイはまだ始まってすらいない。",
+    "明日の練習は何時からだっけ？",
+]
+
+
+def _status_kb():
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0])
+    return fields
+
+
+def _child(mmap):
+    before = _status_kb()
+    from janome.tokenizer import Tokenizer
+    tokenizer = Tokenizer(mmap=mmap)
+    for line in SAMPLE:
+        list(tokenizer.tokenize(line))
+    after = _status_kb()
+    print(json.dumps({k: after[k] - before.get(k, 0) for k in after}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--child", choices=["mmap", "heap"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child == "mmap")
+        return 0
+    if not sys.platform.startswith("linux"):
+        print("This measurement reads /proc and only runs on Linux.")
+        return 1
+
+    results = {}
+    for mode in ("heap", "mmap"):
+        out = subprocess.run([sys.executable, __file__, "--child", mode],
+                             capture_output=True, text=True, check=True)
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+        r = results[mode]
+        print(f"{mode:>4}: rss +{r['VmRSS'] / 1024:.1f} MiB "
+              f"(private +{r.get('RssAnon', 0) / 1024:.1f} MiB, shared file +{r.get('RssFile', 0) / 1024:.1f} MiB)")
+    saved = results["heap"].get("RssAnon", 0) - results["mmap"].get("RssAnon", 0)
+    print(f"private memory saved per process with mmap: {saved / 1024:.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
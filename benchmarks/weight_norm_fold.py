@@ -0,0 +1,66 @@
+"""Inference speedup from folding weight norm, for every config in configs/.
+
+Each model is timed as loaded (weight norm recomputed on every forward),
+then ``prepare_for_inference`` folds it, checking that the output is
+unchanged, and the model is timed again.  ``G_<config stem>.pth`` from
+``--checkpoints`` is used when present, random weights otherwise.
+
+    python benchmarks/weight_norm_fold.py --checkpoints models/ --runs 10
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import torch  # noqa: E402
+
+import synthesis  # noqa: E402
+import utils  # noqa: E402
+
+
+def _time_infer(model, inputs, runs):
+    x, x_lengths, sid = inputs
+    times = []
+    with torch.no_grad():
+        for _ in range(runs + 1):
+            torch.manual_seed(0)
+            start = time.perf_counter()
+            model.infer(x, x_lengths, sid=sid)
+            times.append(time.perf_counter() - start)
+    return statistics.median(times[1:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", type=Path, default=ROOT / "configs")
+    parser.add_argument("--checkpoints", type=Path, default=None, help="directory holding G_<config>.pth files")
+    parser.add_argument("--length", type=int, default=120, help="input symbols per utterance")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    print(f"{'config':<16}{'source':>8}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    for config in sorted(args.configs.glob("*.json")):
+        hps = utils.get_hparams_from_file(str(config))
+        model = synthesis.build_model(hps, synthesis.preset_for_config(config.name), inference_only=True)
+        model_path = args.checkpoints / f"G_{config.stem}.pth" if args.checkpoints else None
+        source = "random"
+        if model_path is not None and model_path.exists():
+            utils.load_model_state(model, utils.load_checkpoint_dict(str(model_path))["model"])
+            source = "ckpt"
+        inputs = synthesis.check_inputs(model, args.length)
+        before = _time_infer(model, inputs, args.runs)
+        model.prepare_for_inference(inputs)
+        after = _time_infer(model, inputs, args.runs)
+        print(f"{config.stem:<16}{source:>8}{before * 1000:>11.1f}{after * 1000:>10.1f}{before / after:>8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
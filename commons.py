@@ -125,6 +125,11 @@ def sequence_mask(length, max_length=None):
   return x.unsqueeze(0) < length.unsqueeze(1)
 
 
+def full_precision(x):
+  """Context that turns autocast off on x's device, for float32 islands in reduced-precision inference."""
+  return torch.autocast(x.device.type, enabled=False)
+
+
 def generate_path(duration, mask):
   """
   duration: [b, 1, t_x]
@@ -143,6 +148,23 @@ def generate_path(duration, mask):
   return path
 
 
+def expand_by_duration(x, duration, t_y):
+  """
+  x: [b, d, t_x]
+  duration: [b, 1, t_x], whole numbers
+  returns [b, d, t_y]: x[:, :, i] repeated duration[:, :, i] times, zero past the total duration
+
+  Same result as matmul with generate_path, but gathers through a frame -> token
+  index instead of building the dense [t_y, t_x] path.
+  """
+  cum_duration = torch.cumsum(duration.squeeze(1), -1)
+  frames = torch.arange(t_y, dtype=cum_duration.dtype, device=duration.device)
+  index = torch.searchsorted(cum_duration, frames.expand(x.size(0), t_y).contiguous(), right=True)
+  covered = (index < x.size(2)).unsqueeze(1).to(x.dtype)
+  index = index.clamp_max(x.size(2) - 1).unsqueeze(1).expand(-1, x.size(1), -1)
+  return torch.gather(x, 2, index) * covered
+
+
 def clip_grad_value_(parameters, clip_value, norm_type=2):
   if isinstance(parameters, torch.Tensor):
     parameters = [parameters]
@@ -0,0 +1,208 @@
+"""TorchScript engine for ``SynthesizerTrn.infer``.
+
+Short lines spend most of eager ``infer`` in Python and dispatcher overhead.
+``CompiledSynthesizer`` traces two graphs:
+
+* ``front`` - text encoder and duration predictor, bucketed by symbol count
+* ``back``  - reverse flow and decoder, bucketed by frame count
+
+Inputs are zero-padded up to the next bucket and the masks keep padding out
+of the result, just like padding in a batch, so each graph is traced once
+per bucket.  Noise is drawn outside the graphs in the same order and shape
+as eager ``infer``, and the decoder masks every layer past the real frame
+count, so a given seed yields the same audio; tracing draws its example
+inputs from a private generator and leaves the global RNG alone.  The
+alignment between the two stays eager because its output length depends on
+the predicted durations.  Traced graphs are written to ``cache_dir``, keyed
+by checkpoint digest, bucket, graph version and torch version, so later runs
+load them instead of tracing again.  When a length is beyond the
+largest bucket, or tracing or loading fails, the call runs eagerly.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import warnings
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+from models import SynthesizerTrn
+
+logger = logging.getLogger(__name__)
+
+TEXT_BUCKETS = (64, 128, 256, 512)
+FRAME_BUCKETS = (256, 512, 1024, 2048, 4096)
+# Bumped whenever the stages change, so graphs cached by older code are not loaded.
+GRAPH_VERSION = 2
+
+
+class FrontStage(nn.Module):
+    """Text encoder and duration predictor: symbols to prior statistics and log durations."""
+
+    def __init__(self, model: SynthesizerTrn) -> None:
+        super().__init__()
+        self.enc_p = model.enc_p
+        self.dp = model.dp
+        self.emb_g = getattr(model, "emb_g", None)
+        self.use_sdp = model.use_sdp
+        self.n_speakers = model.n_speakers
+
+    def forward(self, x, x_lengths, sid, noise_w, noise_scale_w):
+        g = self.emb_g(sid).unsqueeze(-1) if self.n_speakers > 0 else None
+        # Holds every attribute infer_durations uses, so it can run on this wrapper.
+        return SynthesizerTrn.infer_durations(self, x, x_lengths, g=g,
+                                              noise_scale_w=noise_scale_w, noise_w=noise_w)
+
+
+class BackStage(nn.Module):
+    """Reverse flow and decoder: prior sample to audio."""
+
+    def __init__(self, model: SynthesizerTrn) -> None:
+        super().__init__()
+        self.flow = model.flow
+        self.dec = model.dec
+        self.emb_g = getattr(model, "emb_g", None)
+        self.n_speakers = model.n_speakers
+
+    def forward(self, z_p, y_mask, sid):
+        g = self.emb_g(sid).unsqueeze(-1) if self.n_speakers > 0 else None
+        z = self.flow(z_p, y_mask, g=g, reverse=True)
+        return self.dec(z * y_mask, g=g, x_mask=y_mask)
+
+
+def _bucket(length: int, buckets: Sequence[int]) -> Optional[int]:
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return None
+
+
+class CompiledSynthesizer:
+    """Drop-in for a prepared ``SynthesizerTrn`` whose ``infer`` runs traced graphs."""
+
+    def __init__(self, model: SynthesizerTrn, cache_dir: Optional[Path] = None,
+                 model_digest: Optional[str] = None,
+                 text_buckets: Sequence[int] = TEXT_BUCKETS,
+                 frame_buckets: Sequence[int] = FRAME_BUCKETS) -> None:
+        self.model = model
+        self.n_speakers = model.n_speakers
+        self.upsample_rates = model.upsample_rates
+        self.hop_length = 1
+        for rate in model.upsample_rates:
+            self.hop_length *= rate
+        self.cache_dir = Path(cache_dir) if cache_dir is not None and model_digest else None
+        self.model_digest = model_digest
+        self.text_buckets = tuple(sorted(text_buckets))
+        self.frame_buckets = tuple(sorted(frame_buckets))
+        self._stages = {"front": FrontStage(model).eval(), "back": BackStage(model).eval()}
+        self._graphs: Dict[Tuple[str, int], Optional[torch.jit.ScriptModule]] = {}
+        self._lock = threading.Lock()
+        self.traced = 0
+        self.loaded = 0
+        self.eager_calls = 0
+
+    def _cache_path(self, stage: str, bucket: int) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        version = torch.__version__.replace("+", "_")
+        return self.cache_dir / f"{self.model_digest[:16]}-{stage}-{bucket}-v{GRAPH_VERSION}-torch{version}.pt"
+
+    def _example_inputs(self, stage: str, bucket: int):
+        # A private generator, so tracing on first use doesn't shift the noise
+        # that a seeded infer call draws next.
+        generator = torch.Generator().manual_seed(bucket)
+        sid = torch.zeros(1, dtype=torch.long)
+        if stage == "front":
+            x = torch.ones(1, bucket, dtype=torch.long)
+            noise_w = torch.randn(1, 2, bucket, generator=generator)
+            return x, torch.LongTensor([bucket]), sid, noise_w, torch.tensor(1.0)
+        z_p = torch.randn(1, self.model.inter_channels, bucket, generator=generator)
+        return z_p, torch.ones(1, 1, bucket), sid
+
+    def _share_weights(self, graph: torch.jit.ScriptModule, stage: str) -> None:
+        # A graph loaded from disk carries its own copy of the weights; point
+        # it back at the model's tensors so each bucket doesn't duplicate them.
+        module = self._stages[stage]
+        try:
+            for name, tensor in list(module.named_parameters()) + list(module.named_buffers()):
+                parent, _, leaf = name.rpartition(".")
+                setattr(graph.get_submodule(parent) if parent else graph, leaf, tensor)
+        except Exception as exc:
+            logger.info("Cached %s graph keeps its own weights: %s", stage, exc)
+
+    def _graph(self, stage: str, bucket: int) -> Optional[torch.jit.ScriptModule]:
+        key = (stage, bucket)
+        with self._lock:
+            if key in self._graphs:
+                return self._graphs[key]
+            graph = None
+            path = self._cache_path(stage, bucket)
+            try:
+                if path is not None and path.exists():
+                    graph = torch.jit.load(str(path), map_location="cpu")
+                    self._share_weights(graph, stage)
+                    self.loaded += 1
+                else:
+                    with torch.no_grad(), warnings.catch_warnings():
+                        warnings.simplefilter("ignore", torch.jit.TracerWarning)
+                        graph = torch.jit.trace(self._stages[stage], self._example_inputs(stage, bucket),
+                                                check_trace=False)
+                    self.traced += 1
+                    if path is not None:
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                        torch.jit.save(graph, str(tmp))
+                        tmp.replace(path)
+            except Exception as exc:
+                logger.warning("Could not compile %s stage for length %d, using eager: %s", stage, bucket, exc)
+                graph = None
+            self._graphs[key] = graph
+            return graph
+
+    def warm_up(self) -> None:
+        """Trace or load every bucket now instead of on first use."""
+        for bucket in self.text_buckets:
+            self._graph("front", bucket)
+        for bucket in self.frame_buckets:
+            self._graph("back", bucket)
+
+    def infer(self, x, x_lengths, sid=None, noise_scale=1, length_scale=1, noise_scale_w=1., max_len=None):
+        text_bucket = _bucket(x.size(1), self.text_buckets)
+        front = None
+        if x.size(0) == 1 and max_len is None and text_bucket is not None:
+            front = self._graph("front", text_bucket)
+        if front is None:
+            self.eager_calls += 1
+            return self.model.infer(x, x_lengths, sid=sid, noise_scale=noise_scale,
+                                    length_scale=length_scale, noise_scale_w=noise_scale_w, max_len=max_len)
+
+        sid_in = sid if sid is not None else torch.zeros(1, dtype=torch.long)
+        length = x.size(1)
+        # Drawn here at the real length, as eager infer does, so a seed gives the same audio.
+        noise_w = torch.randn(1, 2, length) if self.model.use_sdp else torch.zeros(1, 2, length)
+        pad = (0, text_bucket - length)
+        m_p, logs_p, x_mask, logw = front(F.pad(x, pad), x_lengths, sid_in, F.pad(noise_w, pad),
+                                          torch.tensor(float(noise_scale_w)))
+        m_p, logs_p, x_mask, logw = (t[:, :, :length] for t in (m_p, logs_p, x_mask, logw))
+        attn, y_mask, m_p, logs_p = self.model.align(m_p, logs_p, x_mask, logw, length_scale=length_scale)
+        z_p = m_p + torch.randn_like(m_p) * torch.exp(logs_p) * noise_scale
+
+        frames = z_p.size(2)
+        frame_bucket = _bucket(frames, self.frame_buckets)
+        back = self._graph("back", frame_bucket) if frame_bucket is not None else None
+        if back is None:
+            self.eager_calls += 1
+            o = self._stages["back"](z_p, y_mask, sid_in)
+        else:
+            pad = (0, frame_bucket - frames)
+            o = back(F.pad(z_p, pad), F.pad(y_mask, pad), sid_in)[:, :, :frames * self.hop_length]
+        return o, attn, y_mask, (None, z_p, m_p, logs_p)
+
+    def stats(self) -> Dict[str, int]:
+        return {"traced": self.traced, "loaded": self.loaded, "eager_calls": self.eager_calls,
+                "graphs": sum(1 for g in self._graphs.values() if g is not None)}
@@ -0,0 +1,53 @@
+"""Export a training checkpoint as a compact inference-only model.
+
+The result keeps only what ``SynthesizerTrn.infer`` uses (no optimizer
+state, no posterior encoder), has weight norm folded into the conv weights
+and embeds the config and symbol preset::
+
+    python export_model.py -c configs/mmj.json -m G_mmj.pth -o mmj.infer.pth --fp16
+
+The exported file can be opened anywhere a ``G_*.pth`` is accepted.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import torch
+
+import synthesis
+
+logger = logging.getLogger("export_model")
+
+
+def export(cfg_path: Path, model_path: Path, out_path: Path, half: bool = False) -> None:
+    preset = synthesis.preset_for_config(cfg_path.name)
+    model = synthesis.load_model(cfg_path, model_path, preset, verify=True)
+    checkpoint = synthesis.export_checkpoint(cfg_path, model, preset, half=half)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    torch.save(checkpoint, tmp)
+    tmp.replace(out_path)
+    logger.info("Exported %s (%.1f MB) -> %s (%.1f MB, %s)",
+                model_path.name, model_path.stat().st_size / 2 ** 20,
+                out_path.name, out_path.stat().st_size / 2 ** 20, checkpoint["dtype"])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--config", type=Path, required=True, help="model config json")
+    parser.add_argument("-m", "--model", type=Path, required=True, help="G_*.pth checkpoint")
+    parser.add_argument("-o", "--output", type=Path, default=None,
+                        help="output path (default: <model>.infer.pth next to the checkpoint)")
+    parser.add_argument("--fp16", action="store_true", help="store weights as float16")
+    args = parser.parse_args(argv)
+
+    out_path = args.output or args.model.with_name(args.model.stem + ".infer.pth")
+    export(args.config, args.model, out_path, half=args.fp16)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
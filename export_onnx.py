@@ -0,0 +1,139 @@
+"""Export a model to ONNX for the onnxruntime backend.
+
+The export is a directory with two graphs and their metadata:
+
+* ``front.onnx`` - text encoder and (stochastic) duration predictor
+* ``back.onnx``  - reverse flow and HiFi-GAN decoder
+* ``meta.json``  - hop length, speaker count and the other shapes the runtime needs
+
+Batch and sequence length are dynamic.  The alignment between the graphs
+and all noise draws stay in torch (see onnx_backend.py), so a seed gives
+the same audio as the PyTorch backend::
+
+    python export_onnx.py -c configs/mmj.json -m G_mmj.pth -o mmj.onnx
+"""
+from __future__ import annotations
+
+import argparse
+import inspect
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+from typing import List, Optional
+
+import torch
+
+import synthesis
+from compiled_infer import BackStage, FrontStage
+from models import SynthesizerTrn
+
+logger = logging.getLogger("export_onnx")
+
+ONNX_FORMAT = "vits-onnx"
+ONNX_VERSION = 1
+OPSET = 15
+# The TorchScript-based exporter; the dynamo exporter that torch >= 2.9
+# defaults to cannot trace these stages.  Older torch has no such switch.
+_EXPORT_KWARGS = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+
+def export_onnx(model: SynthesizerTrn, out_dir: Path, opset: int = OPSET,
+                overwrite: bool = True) -> Path:
+    """Write ``front.onnx``, ``back.onnx`` and ``meta.json`` for a prepared model.
+
+    The files are written to a private temporary directory next to
+    ``out_dir`` and moved into place at the end, so processes exporting the
+    same model at once never see or delete each other's partial files.
+    Without ``overwrite`` an export already at ``out_dir``, such as one
+    another process just finished, is kept and this one discarded.
+    """
+    out_dir = Path(out_dir)
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=out_dir.name + ".", suffix=".tmp", dir=out_dir.parent))
+    try:
+        _export_stages(model, tmp, opset)
+        _move_into_place(tmp, out_dir, overwrite)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out_dir
+
+
+def _move_into_place(tmp: Path, out_dir: Path, overwrite: bool) -> None:
+    try:
+        os.replace(tmp, out_dir)
+        return
+    except OSError:
+        # out_dir exists and is not empty.
+        if not overwrite and (out_dir / "meta.json").exists():
+            return
+        shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+
+
+def _export_stages(model: SynthesizerTrn, tmp: Path, opset: int) -> None:
+
+    length, frames = 50, 200
+    sid = torch.zeros(1, dtype=torch.long)
+    front_inputs = (torch.ones(1, length, dtype=torch.long), torch.LongTensor([length]), sid,
+                    torch.randn(1, 2, length), torch.tensor(1.0))
+    back_inputs = (torch.randn(1, model.inter_channels, frames), torch.ones(1, 1, frames), sid)
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter("ignore", torch.jit.TracerWarning)
+        torch.onnx.export(
+            FrontStage(model).eval(), front_inputs, str(tmp / "front.onnx"), opset_version=opset, **_EXPORT_KWARGS,
+            input_names=["input", "input_lengths", "sid", "noise_w", "noise_scale_w"],
+            output_names=["m_p", "logs_p", "x_mask", "logw"],
+            dynamic_axes={
+                "input": {0: "batch", 1: "phonemes"},
+                "input_lengths": {0: "batch"},
+                "sid": {0: "batch"},
+                "noise_w": {0: "batch", 2: "phonemes"},
+                "m_p": {0: "batch", 2: "phonemes"},
+                "logs_p": {0: "batch", 2: "phonemes"},
+                "x_mask": {0: "batch", 2: "phonemes"},
+                "logw": {0: "batch", 2: "phonemes"},
+            })
+        torch.onnx.export(
+            BackStage(model).eval(), back_inputs, str(tmp / "back.onnx"), opset_version=opset, **_EXPORT_KWARGS,
+            input_names=["z_p", "y_mask", "sid"],
+            output_names=["audio"],
+            dynamic_axes={
+                "z_p": {0: "batch", 2: "frames"},
+                "y_mask": {0: "batch", 2: "frames"},
+                "sid": {0: "batch"},
+                "audio": {0: "batch", 2: "samples"},
+            })
+    meta = {
+        "format": ONNX_FORMAT,
+        "version": ONNX_VERSION,
+        "n_speakers": model.n_speakers,
+        "use_sdp": model.use_sdp,
+        "inter_channels": model.inter_channels,
+        "upsample_rates": list(model.upsample_rates),
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--config", type=Path, required=True, help="model config json")
+    parser.add_argument("-m", "--model", type=Path, required=True, help="G_*.pth checkpoint")
+    parser.add_argument("-o", "--output", type=Path, default=None,
+                        help="output directory (default: <model>.onnx next to the checkpoint)")
+    parser.add_argument("--opset", type=int, default=OPSET)
+    args = parser.parse_args(argv)
+
+    out_dir = args.output or args.model.with_suffix(".onnx")
+    model = synthesis.load_model(args.config, args.model)
+    export_onnx(model, out_dir, args.opset)
+    logger.info("Exported %s -> %s", args.model.name, out_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
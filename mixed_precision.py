@@ -0,0 +1,53 @@
+"""bfloat16 inference on CPU.
+
+``Bf16Synthesizer`` runs ``infer`` under CPU autocast, so the convolutions
+and matmuls of the text encoder, duration predictor, flows and decoder run
+in bfloat16 while the weights stay float32.  The numerically sensitive
+pieces are pinned to float32 in the model code itself: the
+rational-quadratic spline (transforms.py), the ``Log`` flow and noise of the
+stochastic duration predictor, the attention softmax and the duration
+``exp`` / prior expansion in ``SynthesizerTrn.align``.
+"""
+from __future__ import annotations
+
+import logging
+
+import torch
+
+from models import SynthesizerTrn
+
+logger = logging.getLogger(__name__)
+
+
+def bf16_supported() -> bool:
+    """Whether this CPU has native bfloat16 kernels (AVX512-BF16 / AMX)."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+class Bf16Synthesizer:
+    """Drop-in for a prepared ``SynthesizerTrn`` whose ``infer`` runs under bfloat16 autocast."""
+
+    def __init__(self, model: SynthesizerTrn, dtype: torch.dtype = torch.bfloat16) -> None:
+        self.model = model
+        self.dtype = dtype
+        self.n_speakers = model.n_speakers
+        self.upsample_rates = model.upsample_rates
+
+    def infer(self, x, x_lengths, sid=None, noise_scale=1, length_scale=1, noise_scale_w=1., max_len=None):
+        with torch.autocast("cpu", dtype=self.dtype):
+            o, attn, y_mask, (z, z_p, m_p, logs_p) = self.model.infer(
+                x, x_lengths, sid=sid, noise_scale=noise_scale, length_scale=length_scale,
+                noise_scale_w=noise_scale_w, max_len=max_len)
+        return o.float(), attn, y_mask, (z.float(), z_p, m_p, logs_p)
+
+
+def bf16(model: SynthesizerTrn):
+    """``Bf16Synthesizer`` around ``model``, or ``model`` itself on CPUs without bfloat16 kernels."""
+    if not bf16_supported():
+        # Emulated bfloat16 is slower than float32, so there is nothing to gain.
+        logger.warning("This CPU has no bfloat16 kernels, running in float32")
+        return model
+    return Bf16Synthesizer(model)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from presets import SymbolPreset, preset_for_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_MB = 2048
+
+# Backends whose models the pool keeps.  int8 is a quantized copy that is
+# slow to calibrate; compiled and onnx graphs are cached on disk and bf16 is
+# a thin wrapper, so those are built on top of the eager model by the caller.
+POOLED_BACKENDS = ("eager", "int8")
+
+PoolKey = Tuple[str, str, int, int, str]
+
+
+def model_nbytes(model) -> int:
+    """Bytes held by the state of a module, including the packed weights of quantized layers."""
+    tensors = [t for t in model.state_dict().values() if hasattr(t, "element_size")]
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelPool:
+    """Keeps recently used models resident, evicting the least recently used
+    ones once their combined size exceeds ``budget_bytes``.
+
+    Entries are keyed by config path, checkpoint path, checkpoint mtime,
+    preset and backend, so a re-exported checkpoint is reloaded instead of
+    served stale and an int8 copy is quantized once per checkpoint.  The most
+    recently requested model is never evicted, even if it alone exceeds the
+    budget.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_MB * 1024 * 1024,
+                 loader: Optional[Callable] = None,
+                 quantizer: Optional[Callable] = None) -> None:
+        self.budget_bytes = budget_bytes
+        self._loader = loader
+        self._quantizer = quantizer
+        self._models: "OrderedDict[PoolKey, Tuple[object, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(cfg_path: Path, model_path: Path, preset: SymbolPreset,
+                 backend: str = "eager") -> PoolKey:
+        model_path = Path(model_path).resolve()
+        return (str(Path(cfg_path).resolve()), str(model_path),
+                os.stat(model_path).st_mtime_ns, preset.id, backend)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def get(self, cfg_path: Path, model_path: Path, preset: Optional[SymbolPreset] = None,
+            backend: str = "eager"):
+        if backend not in POOLED_BACKENDS:
+            raise ValueError(f"Backend '{backend}' is not pooled, expected one of {POOLED_BACKENDS}")
+        preset = preset or preset_for_config(Path(cfg_path).name)
+        with self._lock:
+            if self._loader is None or self._quantizer is None:
+                import synthesis
+                self._loader = self._loader or synthesis.load_model
+                self._quantizer = self._quantizer or synthesis.quantize
+            model = self._get(self.make_key(cfg_path, model_path, preset),
+                              lambda: self._loader(cfg_path, model_path, preset))
+            if backend == "int8":
+                base = model
+                model = self._get(self.make_key(cfg_path, model_path, preset, backend),
+                                  lambda: self._quantizer(base, preset))
+            self._evict()
+            return model
+
+    def _get(self, key: PoolKey, build: Callable):
+        entry = self._models.get(key)
+        if entry is not None:
+            self._models.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        model = build()
+        self._models[key] = (model, model_nbytes(model))
+        return model
+
+    def _evict(self) -> None:
+        while len(self._models) > 1 and self.resident_bytes > self.budget_bytes:
+            key, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            logger.info("Evicted model %s from pool", key[1])
+
+    def set_budget(self, budget_bytes: int) -> None:
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "models": len(self._models),
+            "resident_mb": self.resident_bytes // (1024 * 1024),
+            "budget_mb": self.budget_bytes // (1024 * 1024),
+        }
@@ -1,4 +1,5 @@
 import copy
+import itertools
 import math
 import torch
 from torch import nn
@@ -47,10 +48,12 @@ class StochasticDurationPredictor(nn.Module):
     if gin_channels != 0:
       self.cond = nn.Conv1d(gin_channels, filter_channels, 1)
 
-  def forward(self, x, x_mask, w=None, g=None, reverse=False, noise_scale=1.0):
+  def forward(self, x, x_mask, w=None, g=None, reverse=False, noise_scale=1.0, noise=None, cond=None):
     x = torch.detach(x)
     x = self.pre(x)
-    if g is not None:
+    if cond is not None: # precomputed self.cond(g)
+      x = x + cond
+    elif g is not None:
       g = torch.detach(g)
       x = x + self.cond(g)
     x = self.convs(x, x_mask)
@@ -87,7 +90,9 @@ class StochasticDurationPredictor(nn.Module):
     else:
       flows = list(reversed(self.flows))
       flows = flows[:-2] + [flows[-1]] # remove a useless vflow
-      z = torch.randn(x.size(0), 2, x.size(2)).to(device=x.device, dtype=x.dtype) * noise_scale
+      if noise is None:
+        noise = torch.randn(x.size(0), 2, x.size(2))
+      z = noise.to(device=x.device, dtype=self.proj.weight.dtype) * noise_scale # float32 under autocast too
       for flow in flows:
         z = flow(z, x_mask, g=x, reverse=reverse)
       z0, z1 = torch.split(z, [1, 1], 1)
@@ -115,9 +120,11 @@ class DurationPredictor(nn.Module):
     if gin_channels != 0:
       self.cond = nn.Conv1d(gin_channels, in_channels, 1)
 
-  def forward(self, x, x_mask, g=None):
+  def forward(self, x, x_mask, g=None, cond=None):
     x = torch.detach(x)
-    if g is not None:
+    if cond is not None: # precomputed self.cond(g)
+      x = x + cond
+    elif g is not None:
       g = torch.detach(g)
       x = x + self.cond(g)
     x = self.conv_1(x * x_mask)
@@ -141,7 +148,8 @@ class TextEncoder(nn.Module):
       n_heads,
       n_layers,
       kernel_size,
-      p_dropout):
+      p_dropout,
+      attention_block_size=None):
     super().__init__()
     self.n_vocab = n_vocab
     self.out_channels = out_channels
@@ -161,7 +169,8 @@ class TextEncoder(nn.Module):
       n_heads,
       n_layers,
       kernel_size,
-      p_dropout)
+      p_dropout,
+      attention_block_size=attention_block_size)
     self.proj= nn.Conv1d(hidden_channels, out_channels * 2, 1)
 
   def forward(self, x, x_lengths):
@@ -199,15 +208,22 @@ class ResidualCouplingBlock(nn.Module):
       self.flows.append(modules.ResidualCouplingLayer(channels, hidden_channels, kernel_size, dilation_rate, n_layers, gin_channels=gin_channels, mean_only=True))
       self.flows.append(modules.Flip())
 
-  def forward(self, x, x_mask, g=None, reverse=False):
+  def forward(self, x, x_mask, g=None, reverse=False, cond=None):
+    """cond, when given, holds each flow's precomputed WN cond_layer(g), None for the flips."""
+    conds = cond if cond is not None else [None] * len(self.flows)
     if not reverse:
-      for flow in self.flows:
-        x, _ = flow(x, x_mask, g=g, reverse=reverse)
+      for flow, c in zip(self.flows, conds):
+        x, _ = flow(x, x_mask, g=g, reverse=reverse, cond=c)
     else:
-      for flow in reversed(self.flows):
-        x = flow(x, x_mask, g=g, reverse=reverse)
+      for flow, c in zip(reversed(self.flows), reversed(conds)):
+        x = flow(x, x_mask, g=g, reverse=reverse, cond=c)
     return x
 
+  def remove_weight_norm(self):
+    for flow in self.flows:
+      if hasattr(flow, 'remove_weight_norm'):
+        flow.remove_weight_norm()
+
 
 class PosteriorEncoder(nn.Module):
   def __init__(self,
@@ -240,6 +256,9 @@ class PosteriorEncoder(nn.Module):
     z = (m + torch.randn_like(m) * torch.exp(logs)) * x_mask
     return z, m, logs, x_mask
 
+  def remove_weight_norm(self):
+    self.enc.remove_weight_norm()
+
 
 class Generator(torch.nn.Module):
     def __init__(self, initial_channel, resblock, resblock_kernel_sizes, resblock_dilation_sizes, upsample_rates, upsample_initial_channel, upsample_kernel_sizes, gin_channels=0):
@@ -267,20 +286,51 @@ class Generator(torch.nn.Module):
         if gin_channels != 0:
             self.cond = nn.Conv1d(gin_channels, upsample_initial_channel, 1)
 
-    def forward(self, x, g=None):
+        self.upsample_rates = list(upsample_rates)
+        self.hop_length = math.prod(upsample_rates)
+        self.context_frames = self._context_frames(resblock == modules.ResBlock1, resblock_kernel_sizes,
+                                                   resblock_dilation_sizes, upsample_rates, upsample_kernel_sizes)
+
+    @staticmethod
+    def _context_frames(resblock1, resblock_kernel_sizes, resblock_dilation_sizes, upsample_rates, upsample_kernel_sizes):
+        """Receptive field radius of the whole generator, in input frames (rounded up)."""
+        def radius(k, d):
+            return (k - 1) // 2 * d
+        block = max(sum(radius(k, d) + (radius(k, 1) if resblock1 else 0) for d in ds)
+                    for k, ds in zip(resblock_kernel_sizes, resblock_dilation_sizes))
+        # Each layer's radius is counted in its own samples and divided by the
+        # upsampling before it to get frames.
+        frames, scale = 3, 1  # conv_pre
+        for u, k in zip(upsample_rates, upsample_kernel_sizes):
+            frames += math.ceil(k / u) / scale
+            scale *= u
+            frames += block / scale
+        frames += 3 / scale  # conv_post
+        return math.ceil(frames)
+
+    def forward(self, x, g=None, cond=None, x_mask=None):
+        """x_mask [b, 1, t] zeroes every layer's activations past each item's length,
+        so a padded x decodes its valid part exactly as the unpadded x would."""
         x = self.conv_pre(x)
-        if g is not None:
+        if cond is not None:  # precomputed self.cond(g)
+            x = x + cond
+        elif g is not None:
           x = x + self.cond(g)
+        if x_mask is not None:
+            x = x * x_mask
 
         for i in range(self.num_upsamples):
             x = F.leaky_relu(x, modules.LRELU_SLOPE)
             x = self.ups[i](x)
+            if x_mask is not None:
+                x_mask = torch.repeat_interleave(x_mask, self.upsample_rates[i], dim=2)
+                x = x * x_mask
             xs = None
             for j in range(self.num_kernels):
                 if xs is None:
-                    xs = self.resblocks[i*self.num_kernels+j](x)
+                    xs = self.resblocks[i*self.num_kernels+j](x, x_mask)
                 else:
-                    xs += self.resblocks[i*self.num_kernels+j](x)
+                    xs += self.resblocks[i*self.num_kernels+j](x, x_mask)
             x = xs / self.num_kernels
         x = F.leaky_relu(x)
         x = self.conv_post(x)
@@ -288,6 +338,22 @@ class Generator(torch.nn.Module):
 
         return x
 
+    def stream(self, x, g=None, chunk_frames=32, context_frames=None, cond=None):
+        """Decode x [b, c, t] window by window, yielding [b, 1, chunk_frames * hop_length] chunks.
+
+        Each window is decoded with context_frames (default: the receptive
+        field) of latent on both sides and trimmed back, so the chunks joined
+        together equal forward(x, g) up to float rounding, while the
+        upsampling activations only ever cover one window.
+        """
+        context = self.context_frames if context_frames is None else context_frames
+        length = x.size(2)
+        for start in range(0, length, chunk_frames):
+            end = min(start + chunk_frames, length)
+            lo, hi = max(start - context, 0), min(end + context, length)
+            audio = self(x[:, :, lo:hi], g, cond=cond)
+            yield audio[:, :, (start - lo) * self.hop_length:(end - lo) * self.hop_length]
+
     def remove_weight_norm(self):
         print('Removing weight norm...')
         for l in self.ups:
@@ -412,6 +478,8 @@ class SynthesizerTrn(nn.Module):
     n_speakers=0,
     gin_channels=0,
     use_sdp=True,
+    inference_only=False,
+    attention_block_size=None,
     **kwargs):
 
     super().__init__()
@@ -443,9 +511,12 @@ class SynthesizerTrn(nn.Module):
         n_heads,
         n_layers,
         kernel_size,
-        p_dropout)
+        p_dropout,
+        attention_block_size=attention_block_size)
     self.dec = Generator(inter_channels, resblock, resblock_kernel_sizes, resblock_dilation_sizes, upsample_rates, upsample_initial_channel, upsample_kernel_sizes, gin_channels=gin_channels)
-    self.enc_q = PosteriorEncoder(spec_channels, inter_channels, hidden_channels, 5, 1, 16, gin_channels=gin_channels)
+    # infer() never uses the posterior encoder; it is only needed for training and voice conversion.
+    if not inference_only:
+      self.enc_q = PosteriorEncoder(spec_channels, inter_channels, hidden_channels, 5, 1, 16, gin_channels=gin_channels)
     self.flow = ResidualCouplingBlock(inter_channels, hidden_channels, 5, 1, 4, gin_channels=gin_channels)
 
     if use_sdp:
@@ -456,6 +527,12 @@ class SynthesizerTrn(nn.Module):
     if n_speakers > 1:
       self.emb_g = nn.Embedding(n_speakers, gin_channels)
 
+    self.weight_norm_removed = False
+    # Per-speaker conditioning projections for infer, see speaker_conditioning.
+    self.cache_speaker_conditioning = True
+    self._speaker_conditioning = {}
+    self._conditioning_fingerprint = None
+
   def forward(self, x, x_lengths, y, y_lengths, sid=None):
 
     x, m_p, logs_p, x_mask = self.enc_p(x, x_lengths)
@@ -496,31 +573,159 @@ class SynthesizerTrn(nn.Module):
     o = self.dec(z_slice, g=g)
     return o, l_length, attn, ids_slice, x_mask, y_mask, (z, z_p, m_p, logs_p, m_q, logs_q)
 
-  def infer(self, x, x_lengths, sid=None, noise_scale=1, length_scale=1, noise_scale_w=1., max_len=None):
-    x, m_p, logs_p, x_mask = self.enc_p(x, x_lengths)
+  def infer(self, x, x_lengths, sid=None, noise_scale=1, length_scale=1, noise_scale_w=1., max_len=None, return_attn=False):
+    g, cond = self.speaker_conditioning(sid)
+    m_p, logs_p, x_mask, logw = self.infer_durations(x, x_lengths, g=g, noise_scale_w=noise_scale_w, dp_cond=cond.get('dp'))
+    attn, y_mask, m_p, logs_p = self.align(m_p, logs_p, x_mask, logw, length_scale=length_scale, return_attn=return_attn)
+    z_p = m_p + torch.randn_like(m_p) * torch.exp(logs_p) * noise_scale
+    z = self.flow(z_p, y_mask, g=g, reverse=True, cond=cond.get('flow'))
+    o = self.dec((z * y_mask)[:,:,:max_len], g=g, cond=cond.get('dec'))
+    return o, attn, y_mask, (z, z_p, m_p, logs_p)
+
+  def infer_stream(self, x, x_lengths, sid=None, noise_scale=1, length_scale=1, noise_scale_w=1., chunk_frames=32):
+    """infer, yielding audio [b, 1, samples] chunk by chunk as the decoder streams (see Generator.stream).
+
+    Noise is drawn as in infer, so a seed gives the same audio.
+    """
+    g, cond = self.speaker_conditioning(sid)
+    m_p, logs_p, x_mask, logw = self.infer_durations(x, x_lengths, g=g, noise_scale_w=noise_scale_w, dp_cond=cond.get('dp'))
+    attn, y_mask, m_p, logs_p = self.align(m_p, logs_p, x_mask, logw, length_scale=length_scale)
+    z_p = m_p + torch.randn_like(m_p) * torch.exp(logs_p) * noise_scale
+    z = self.flow(z_p, y_mask, g=g, reverse=True, cond=cond.get('flow'))
+    yield from self.dec.stream(z * y_mask, g=g, chunk_frames=chunk_frames, cond=cond.get('dec'))
+
+  def speaker_embedding(self, sid):
     if self.n_speakers > 0:
-      g = self.emb_g(sid).unsqueeze(-1) # [b, h, 1]
+      return self.emb_g(sid).unsqueeze(-1) # [b, h, 1]
+    return None
+
+  def speaker_conditioning(self, sid):
+    """Speaker embedding g and a dict of its conditioning projections for infer.
+
+    The projections ('dp': dp.cond, 'flow': each coupling layer's WN
+    cond_layer, 'dec': dec.cond) only depend on the speaker, so with
+    gradients off they come from a per-speaker cache, rebuilt whenever the
+    weights behind them change.  The dict is empty when nothing is cached.
+    """
+    if (not self.cache_speaker_conditioning or not hasattr(self, 'emb_g') or sid is None
+        or torch.is_grad_enabled() or torch.jit.is_tracing()):
+      return self.speaker_embedding(sid), {}
+    fingerprint = self._conditioning_weights_fingerprint()
+    if fingerprint != self._conditioning_fingerprint:
+      self.precompute_speaker_conditioning()
+    cached = [self._speaker_conditioning.get(s) for s in sid.tolist()]
+    if any(c is None for c in cached):
+      return self.speaker_embedding(sid), {}
+    if len(cached) == 1:
+      cond = cached[0]
     else:
-      g = None
-
+      cond = {
+        'g': torch.cat([c['g'] for c in cached]),
+        'dp': torch.cat([c['dp'] for c in cached]),
+        'flow': [None if f[0] is None else torch.cat(f) for f in zip(*[c['flow'] for c in cached])],
+        'dec': torch.cat([c['dec'] for c in cached]),
+      }
+    return cond['g'], cond
+
+  @torch.no_grad()
+  def precompute_speaker_conditioning(self):
+    """Project every speaker's embedding through all conditioning layers at once and cache the results."""
+    self._speaker_conditioning = {}
+    if not hasattr(self, 'emb_g'):
+      return
+    self._conditioning_fingerprint = self._conditioning_weights_fingerprint()
+    g = self.emb_g.weight.unsqueeze(-1) # [n_speakers, h, 1]
+    dp = self.dp.cond(g)
+    flow = [f.enc.cond_layer(g) if hasattr(f, 'enc') else None for f in self.flow.flows]
+    dec = self.dec.cond(g)
+    for s in range(g.size(0)):
+      self._speaker_conditioning[s] = {
+        'g': g[s:s+1],
+        'dp': dp[s:s+1],
+        'flow': [None if f is None else f[s:s+1] for f in flow],
+        'dec': dec[s:s+1],
+      }
+
+  def _conditioning_weights_fingerprint(self):
+    # Identity and in-place version of every tensor the cache is computed
+    # from; loading, folding or quantizing weights changes it.
+    layers = [self.emb_g, self.dp.cond, self.dec.cond] + [f.enc.cond_layer for f in self.flow.flows if hasattr(f, 'enc')]
+    return tuple((t.data_ptr(), t._version) for layer in layers
+                 for t in itertools.chain(layer.parameters(), layer.buffers()))
+
+  def infer_durations(self, x, x_lengths, g=None, noise_scale_w=1., noise_w=None, dp_cond=None):
+    """Text encoder and duration predictor half of infer.
+
+    noise_w, shaped [b, 2, t], replaces the stochastic duration predictor's own draw.
+    dp_cond is a precomputed dp.cond(g).
+    """
+    x, m_p, logs_p, x_mask = self.enc_p(x, x_lengths)
     if self.use_sdp:
-      logw = self.dp(x, x_mask, g=g, reverse=True, noise_scale=noise_scale_w)
+      logw = self.dp(x, x_mask, g=g, reverse=True, noise_scale=noise_scale_w, noise=noise_w, cond=dp_cond)
     else:
-      logw = self.dp(x, x_mask, g=g)
+      logw = self.dp(x, x_mask, g=g, cond=dp_cond)
+    return m_p, logs_p, x_mask, logw
+
+  @staticmethod
+  def align(m_p, logs_p, x_mask, logw, length_scale=1, return_attn=False):
+    """Expand the prior statistics from text positions to frames.
+
+    The dense [b, 1, t', t] path is only built with return_attn; otherwise
+    attn is None.  Always float32: durations come from exp(logw), and the
+    expanded statistics feed the noise draw in infer.
+    """
+    with commons.full_precision(logw):
+      return SynthesizerTrn._align(m_p.float(), logs_p.float(), x_mask.float(), logw.float(), length_scale, return_attn)
+
+  @staticmethod
+  def _align(m_p, logs_p, x_mask, logw, length_scale, return_attn):
     w = torch.exp(logw) * x_mask * length_scale
     w_ceil = torch.ceil(w)
     y_lengths = torch.clamp_min(torch.sum(w_ceil, [1, 2]), 1).long()
     y_mask = torch.unsqueeze(commons.sequence_mask(y_lengths, None), 1).to(x_mask.dtype)
-    attn_mask = torch.unsqueeze(x_mask, 2) * torch.unsqueeze(y_mask, -1)
-    attn = commons.generate_path(w_ceil, attn_mask)
-
-    m_p = torch.matmul(attn.squeeze(1), m_p.transpose(1, 2)).transpose(1, 2) # [b, t', t], [b, t, d] -> [b, d, t']
-    logs_p = torch.matmul(attn.squeeze(1), logs_p.transpose(1, 2)).transpose(1, 2) # [b, t', t], [b, t, d] -> [b, d, t']
-
-    z_p = m_p + torch.randn_like(m_p) * torch.exp(logs_p) * noise_scale
-    z = self.flow(z_p, y_mask, g=g, reverse=True)
-    o = self.dec((z * y_mask)[:,:,:max_len], g=g)
-    return o, attn, y_mask, (z, z_p, m_p, logs_p)
+    attn = None
+    if return_attn:
+      attn_mask = torch.unsqueeze(x_mask, 2) * torch.unsqueeze(y_mask, -1)
+      attn = commons.generate_path(w_ceil, attn_mask)
+
+    stats = commons.expand_by_duration(torch.cat([m_p, logs_p], 1), w_ceil, y_mask.size(2)) # [b, 2d, t] -> [b, 2d, t']
+    m_p, logs_p = torch.split(stats, m_p.size(1), dim=1)
+    return attn, y_mask, m_p, logs_p
+
+  def remove_weight_norm(self):
+    """Fold weight norm into plain conv weights everywhere; does nothing the second time."""
+    if self.weight_norm_removed:
+      return
+    self.dec.remove_weight_norm()
+    self.flow.remove_weight_norm()
+    if hasattr(self, 'enc_q'):
+      self.enc_q.remove_weight_norm()
+    self.weight_norm_removed = True
+
+  def prepare_for_inference(self, check_inputs=None, atol=1e-4):
+    """Switch to eval mode, fold weight norm, freeze all parameters and precompute speaker conditioning.
+
+    With check_inputs = (x, x_lengths, sid), infer runs on them with the same
+    noise before and after folding, and a difference above atol raises.
+    """
+    self.eval()
+    if check_inputs is not None:
+      expected = self._reference_output(*check_inputs)
+    self.remove_weight_norm()
+    for param in self.parameters():
+      param.requires_grad_(False)
+    if check_inputs is not None:
+      actual = self._reference_output(*check_inputs)
+      error = (actual - expected).abs().max().item() if actual.shape == expected.shape else float('inf')
+      if error > atol:
+        raise RuntimeError("Output changed by %g after folding weight norm (atol %g)" % (error, atol))
+    self.precompute_speaker_conditioning()
+    return self
+
+  def _reference_output(self, x, x_lengths, sid=None):
+    with torch.no_grad(), torch.random.fork_rng(devices=[]):
+      torch.manual_seed(0)
+      return self.infer(x, x_lengths, sid=sid)[0]
 
   def voice_conversion(self, y, y_lengths, sid_src, sid_tgt):
     assert self.n_speakers > 0, "n_speakers have to be larger than 0."
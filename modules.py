@@ -145,11 +145,14 @@ class WN(torch.nn.Module):
       res_skip_layer = torch.nn.utils.weight_norm(res_skip_layer, name='weight')
       self.res_skip_layers.append(res_skip_layer)
 
-  def forward(self, x, x_mask, g=None, **kwargs):
+  def forward(self, x, x_mask, g=None, cond=None, **kwargs):
+    """cond, when given, is a precomputed cond_layer(g)."""
     output = torch.zeros_like(x)
     n_channels_tensor = torch.IntTensor([self.hidden_channels])
 
-    if g is not None:
+    if cond is not None:
+      g = cond
+    elif g is not None:
       g = self.cond_layer(g)
 
     for i in range(self.n_layers):
@@ -258,6 +261,7 @@ class ResBlock2(torch.nn.Module):
 
 class Log(nn.Module):
   def forward(self, x, x_mask, reverse=False, **kwargs):
+    x = x.float() # log/exp stay in float32 under autocast
     if not reverse:
       y = torch.log(torch.clamp_min(x, 1e-5)) * x_mask
       logdet = torch.sum(-y, [1, 2])
@@ -321,10 +325,10 @@ class ResidualCouplingLayer(nn.Module):
     self.post.weight.data.zero_()
     self.post.bias.data.zero_()
 
-  def forward(self, x, x_mask, g=None, reverse=False):
+  def forward(self, x, x_mask, g=None, reverse=False, cond=None):
     x0, x1 = torch.split(x, [self.half_channels]*2, 1)
     h = self.pre(x0) * x_mask
-    h = self.enc(h, x_mask, g=g)
+    h = self.enc(h, x_mask, g=g, cond=cond)
     stats = self.post(h) * x_mask
     if not self.mean_only:
       m, logs = torch.split(stats, [self.half_channels]*2, 1)
@@ -342,6 +346,9 @@ class ResidualCouplingLayer(nn.Module):
       x = torch.cat([x0, x1], 1)
       return x
 
+  def remove_weight_norm(self):
+    self.enc.remove_weight_norm()
+
 
 class ConvFlow(nn.Module):
   def __init__(self, in_channels, filter_channels, kernel_size, n_layers, num_bins=10, tail_bound=5.0):
@@ -0,0 +1,68 @@
+"""onnxruntime backend for exports written by export_onnx.py."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import torch
+
+from models import SynthesizerTrn
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional dependency, only needed for this backend
+    ort = None
+
+
+class OnnxSynthesizer:
+    """Runs an ONNX export on CPU behind the same ``infer`` as ``SynthesizerTrn``.
+
+    Noise is drawn with torch in the order eager ``infer`` draws it, and the
+    alignment between the two graphs runs in torch, so ``torch.manual_seed``
+    applies here as well.
+    """
+
+    def __init__(self, directory: Path, threads: Optional[int] = None) -> None:
+        if ort is None:
+            raise RuntimeError("The onnx backend needs onnxruntime (pip install onnxruntime)")
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        self.n_speakers = meta["n_speakers"]
+        self.use_sdp = meta["use_sdp"]
+        self.upsample_rates = meta["upsample_rates"]
+        self.hop_length = int(np.prod(self.upsample_rates))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or torch.get_num_threads()
+        providers = ["CPUExecutionProvider"]
+        self._front = ort.InferenceSession(str(directory / "front.onnx"), options, providers=providers)
+        self._back = ort.InferenceSession(str(directory / "back.onnx"), options, providers=providers)
+
+    @staticmethod
+    def _run(session, feed: Dict[str, np.ndarray]):
+        # The exporter drops inputs a graph never reads (sid for single-speaker
+        # models, the noise inputs without the stochastic duration predictor).
+        names = {i.name for i in session.get_inputs()}
+        outputs = session.run(None, {k: v for k, v in feed.items() if k in names})
+        return [torch.from_numpy(o) for o in outputs]
+
+    def infer(self, x, x_lengths, sid=None, noise_scale=1, length_scale=1, noise_scale_w=1., max_len=None):
+        b, t = x.shape
+        noise_w = torch.randn(b, 2, t) if self.use_sdp else torch.zeros(b, 2, t)
+        sid = sid if sid is not None else torch.zeros(b, dtype=torch.long)
+        m_p, logs_p, x_mask, logw = self._run(self._front, {
+            "input": x.numpy(),
+            "input_lengths": x_lengths.numpy(),
+            "sid": sid.numpy(),
+            "noise_w": noise_w.numpy(),
+            "noise_scale_w": np.array(noise_scale_w, dtype=np.float32),
+        })
+        attn, y_mask, m_p, logs_p = SynthesizerTrn.align(m_p, logs_p, x_mask, logw, length_scale=length_scale)
+        z_p = m_p + torch.randn_like(m_p) * torch.exp(logs_p) * noise_scale
+        o, = self._run(self._back, {"z_p": z_p.numpy(), "y_mask": y_mask.numpy(), "sid": sid.numpy()})
+        if max_len is not None:
+            o = o[:, :, :max_len * self.hop_length]
+        return o, attn, y_mask, (None, z_p, m_p, logs_p)
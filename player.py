@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtMultimedia import QAudio, QAudioFormat, QAudioSink, QMediaDevices
+
+
+class StreamPlayer(QObject):
+    """Plays float audio chunks through a push-mode ``QAudioSink``.
+
+    Chunks can be appended while playback is running; the sink is topped up
+    from an internal buffer on a short timer.
+    """
+
+    FEED_INTERVAL_MS = 20
+
+    finished = Signal()
+
+    def __init__(self, sample_rate: int, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._format = QAudioFormat()
+        self._format.setSampleRate(sample_rate)
+        self._format.setChannelCount(1)
+        self._format.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+        self._sink: Optional[QAudioSink] = None
+        self._device = None
+        self._pending = bytearray()
+        self._closed = False
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.FEED_INTERVAL_MS)
+        self._timer.timeout.connect(self._feed)
+
+    def is_active(self) -> bool:
+        return self._sink is not None
+
+    def start(self) -> None:
+        self.stop()
+        self._closed = False
+        self._sink = QAudioSink(QMediaDevices.defaultAudioOutput(), self._format, self)
+        self._device = self._sink.start()
+        self._timer.start()
+
+    def write(self, audio: np.ndarray) -> None:
+        if self._sink is None:
+            self.start()
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+        self._pending += pcm.tobytes()
+        self._feed()
+
+    def close(self) -> None:
+        """Mark the stream complete; playback stops once the buffer drains."""
+        self._closed = True
+
+    def stop(self) -> None:
+        self._timer.stop()
+        self._pending.clear()
+        if self._sink is not None:
+            self._sink.stop()
+            self._sink.deleteLater()
+        self._sink = None
+        self._device = None
+
+    def _feed(self) -> None:
+        if self._sink is None:
+            return
+        if self._pending:
+            free = self._sink.bytesFree() & ~1
+            if free > 0:
+                written = self._device.write(bytes(self._pending[:free]))
+                if written > 0:
+                    del self._pending[:written]
+        elif self._closed and self._sink.state() != QAudio.State.ActiveState:
+            self.stop()
+            self.finished.emit()
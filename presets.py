@@ -0,0 +1,67 @@
+"""Symbol presets, speaker tables and synthesis defaults.
+
+Kept free of torch and the text front-end so the GUI can import it without
+paying for those at startup.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+SAMPLE_RATE = 22050
+NOISE_SCALE = 0.667
+NOISE_SCALE_W = 0.8
+DEFAULT_SEED = 1234
+CROSSFADE_MS = 10.0
+
+
+@dataclass(frozen=True)
+class SymbolPreset:
+    id: int
+    symbols: List[str]
+
+
+SYMBOL_PRESETS: Dict[str, SymbolPreset] = {
+    "default": SymbolPreset(1, list(' !"&*,-.?ABCINU[]abcdefghijklmnoprstuwyz{}~')),
+    "preset2": SymbolPreset(2, [
+        "_", *list(",.!?-"),
+        *list("AEINOQUabdefghijkmnoprstuvwyzʃʧ↓↑ ")]),
+    "preset3": SymbolPreset(3, [
+        "_", *list(",.!?-~…"),
+        *list("AEINOQUabdefghijkmnoprstuvwyzʃʧʦ↓↑ ")]),
+    "ipa": SymbolPreset(4, [
+        "_", *list(";:,.!?¡¿—…\"«»“” "),
+        *list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"),
+        *list("ɑɐɒæɓʙβɔɕçɗɖðʤəɘɚɛɜɝɞɟʄɡɠɢʛɦɧħɥʜɨɪʝɭɬɫɮʟɱɯɰŋɳɲɴøɵɸθœɶʘɹɺɾɻʀʁɽʂʃʈʧʉʊʋⱱʌɣɤʍχʎʏʑʐʒʔʡʕʢǀǁǂǃˈˌːˑʼʴʰʱʲʷˠˤ˞↓↑→↗↘'̩'ᵻ")]),
+}
+
+CONFIG_TO_PRESET = {
+    "mmj.json": "default",
+    "vbs.json": "default",
+    "ws.json": "default",
+    "mafuyu.json": "default",
+}
+
+MULTI_SPK_GROUPS = {
+    "mmj.json": ["minori", "haruka", "airi", "shizuku"],
+    "vbs.json": ["akito", "an", "kohane", "toya"],
+    "ws.json": ["emu", "nene", "rui", "tsukasa"],
+    "mafuyu.json": ["white", "black"],
+}
+
+
+def preset_for_config(cfg_name: str) -> SymbolPreset:
+    return SYMBOL_PRESETS[CONFIG_TO_PRESET.get(cfg_name, "default")]
+
+
+def resolve_speaker(cfg_name: str, speaker: str) -> Optional[int]:
+    """Map a speaker name or index to ``sid``; ``None`` for single-speaker configs."""
+    speakers = MULTI_SPK_GROUPS.get(cfg_name)
+    if not speakers:
+        return None
+    speaker = speaker.strip()
+    if speaker in speakers:
+        return speakers.index(speaker)
+    if speaker.isdigit() and int(speaker) < len(speakers):
+        return int(speaker)
+    raise ValueError(f"Unknown speaker '{speaker}' for {cfg_name}, expected one of {speakers}")
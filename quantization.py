@@ -0,0 +1,118 @@
+"""Static int8 quantization of the decoder and flow convolutions.
+
+PyTorch's dynamic quantization only covers Linear and recurrent layers, so
+the convolutions are quantized statically.  Each ``Conv1d`` /
+``ConvTranspose1d`` in ``dec`` and ``flow`` is wrapped with quant/dequant
+stubs, observers record activation ranges while a few calibration
+sentences are synthesized, and the convs are then converted to int8
+kernels.  Everything outside the wrappers, including the text encoder,
+duration predictor and the decoder's final ``conv_post``, stays float, so
+durations, and therefore output lengths, match the float model.
+"""
+from __future__ import annotations
+
+import copy
+import logging
+from typing import Iterable, List, Optional, Sequence
+
+import torch
+from torch import nn
+from torch.ao import quantization as tq
+
+from models import SynthesizerTrn
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_TEXTS = (
+    "今日はいい天気ですね。",
+    "セカイはまだ始まってすらいない。",
+    "明日の練習は何時からだっけ？",
+    "みんなで一緒にステージに立てるのが、本当に嬉しいんだ。",
+    "ちょっと待って、まだ準備ができてないよ！",
+    "新しい曲の歌詞を考えてたら、いつの間にか朝になってた。",
+    "ライブが終わったら、みんなでファミレスに行こうよ。",
+    "ショーの準備はばっちりだ、あとは観客を待つだけだな。",
+)
+
+# Modules left in float: the decoder's output layer sets the waveform directly.
+SKIP_MODULES = ("dec.conv_post",)
+
+
+class QuantizedConv(nn.Module):
+    """Quantizes the input of a conv and dequantizes its output."""
+
+    def __init__(self, conv: nn.Module) -> None:
+        super().__init__()
+        self.quant = tq.QuantStub()
+        self.conv = conv
+        self.dequant = tq.DeQuantStub()
+
+    def forward(self, x):
+        return self.dequant(self.conv(self.quant(x)))
+
+
+def quantized_engine() -> str:
+    """Pick and activate the quantized kernel backend for this CPU.
+
+    fbgemm comes first: the x86 engine runs these long, narrow 1d convs
+    through a slow path that allocated ~2.8 GB and took 30x the float time
+    for a 60-symbol line, and its output was far off (6.5 dB SNR against
+    float, 38.5 dB with fbgemm).
+    """
+    supported = torch.backends.quantized.supported_engines
+    for engine in ("fbgemm", "x86", "qnnpack"):
+        if engine in supported:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError("This torch build has no quantized CPU engine")
+
+
+def _wrap_convs(module: nn.Module, prefix: str, qconfig, transpose_qconfig) -> int:
+    count = 0
+    for name, child in module.named_children():
+        path = f"{prefix}.{name}"
+        if path in SKIP_MODULES:
+            continue
+        if isinstance(child, (nn.Conv1d, nn.ConvTranspose1d)):
+            wrapper = QuantizedConv(child)
+            # Quantized transposed convs only support per-tensor weight scales.
+            wrapper.qconfig = transpose_qconfig if isinstance(child, nn.ConvTranspose1d) else qconfig
+            setattr(module, name, wrapper)
+            count += 1
+        else:
+            count += _wrap_convs(child, path, qconfig, transpose_qconfig)
+    return count
+
+
+def calibration_inputs(model: SynthesizerTrn, sequences: Iterable[torch.LongTensor],
+                       speaker_ids: Sequence[Optional[int]] = (None,)) -> List[tuple]:
+    """``(x, x_lengths, sid)`` for every sequence and speaker."""
+    inputs = []
+    for stn in sequences:
+        for speaker_id in speaker_ids:
+            sid = torch.LongTensor([speaker_id]) if speaker_id is not None else None
+            inputs.append((stn.unsqueeze(0), torch.LongTensor([stn.size(0)]), sid))
+    return inputs
+
+
+def quantize_model(model: SynthesizerTrn, inputs: Sequence[tuple],
+                   modules: Sequence[str] = ("dec", "flow")) -> SynthesizerTrn:
+    """An int8 copy of a float model, calibrated on ``(x, x_lengths, sid)`` inputs.
+
+    The float model is left untouched.  Weight norm must be folded first,
+    so the copy goes through ``prepare_for_inference``.
+    """
+    engine = quantized_engine()
+    qconfig = tq.get_default_qconfig(engine)
+    transpose_qconfig = tq.QConfig(activation=qconfig.activation, weight=tq.default_weight_observer)
+
+    quantized = copy.deepcopy(model).prepare_for_inference()
+    wrapped = sum(_wrap_convs(getattr(quantized, name), name, qconfig, transpose_qconfig) for name in modules)
+    tq.prepare(quantized, inplace=True)
+    with torch.no_grad():
+        for seed, (x, x_lengths, sid) in enumerate(inputs):
+            torch.manual_seed(seed)
+            quantized.infer(x, x_lengths, sid=sid)
+    tq.convert(quantized, inplace=True)
+    logger.info("Quantized %d convolutions to int8 (%s), calibrated on %d inputs", wrapped, engine, len(inputs))
+    return quantized
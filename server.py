@@ -0,0 +1,258 @@
+"""Local HTTP synthesis server with dynamic request batching.
+
+    python server.py -c configs/mmj.json -m G_mmj.pth --port 8000
+    curl -d '{"text": "こんにちは", "speaker": "airi", "speed": 1.0}' \
+        http://127.0.0.1:8000/synthesize -o out.wav
+
+``speed`` is used as ``length_scale``, the same way the GUI slider is.
+Requests arriving within ``--batch-window-ms`` of each other are padded into
+one ``SynthesizerTrn.infer`` call.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import soundfile as sf
+
+import attentions
+import synthesis
+
+logger = logging.getLogger("server")
+
+MAX_BODY_BYTES = 1 << 20
+# Accepted "speed" (length scale) values, the range of the GUI's slider.
+MIN_SPEED, MAX_SPEED = 0.5, 2.0
+
+
+@dataclass
+class _Request:
+    text: str
+    speaker_id: Optional[int]
+    length_scale: float
+    future: asyncio.Future = field(repr=False)
+
+
+class BatchingSynthesizer:
+    """Collects concurrent requests and runs them as padded batches.
+
+    Inference runs on a single background thread so the event loop keeps
+    accepting connections while a batch is in flight.
+    """
+
+    def __init__(self, model, preset: synthesis.SymbolPreset,
+                 max_batch: int = 8, window_ms: float = 20.0, batch_g2p: bool = False) -> None:
+        self.model = model
+        self.preset = preset
+        self.batch_g2p = batch_g2p
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.batches = 0
+        self.requests = 0
+        self._queue: "asyncio.Queue[_Request]" = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="infer")
+
+    async def synthesize(self, text: str, speaker_id: Optional[int], length_scale: float):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Request(text, speaker_id, length_scale, future))
+        return await future
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            results = await loop.run_in_executor(self._executor, self._infer_batch, batch)
+            self.batches += 1
+            self.requests += len(batch)
+            for request, result in zip(batch, results):
+                if request.future.done():
+                    continue
+                if isinstance(result, Exception):
+                    request.future.set_exception(result)
+                else:
+                    request.future.set_result(result)
+
+    def _infer_batch(self, batch: List[_Request]) -> list:
+        results: list = [None] * len(batch)
+        ready = []
+        for i, request in enumerate(batch):
+            try:
+                ready.append((i, synthesis.clean_phonemes(request.text, self.preset, self.batch_g2p)))
+            except Exception as exc:
+                results[i] = exc
+        if ready:
+            try:
+                self._synthesize_ready(batch, ready, results)
+            except Exception as exc:
+                if len(ready) > 1:
+                    # Retry one by one so a single bad input fails only its own request.
+                    logger.warning("Batch of %d requests failed (%s), retrying one at a time", len(ready), exc)
+                    for item in ready:
+                        try:
+                            self._synthesize_ready(batch, [item], results)
+                        except Exception as item_exc:
+                            results[item[0]] = item_exc
+                else:
+                    results[ready[0][0]] = exc
+        if len(batch) > 1:
+            logger.debug("Ran batch of %d requests", len(batch))
+        return results
+
+    def _synthesize_ready(self, batch: List[_Request], ready: List[Tuple[int, str]], results: list) -> None:
+        x, x_lengths = synthesis.encode_batch([phonemes for _, phonemes in ready], self.preset)
+        audios = synthesis.synthesize_batch(
+            self.model, x, x_lengths,
+            [batch[i].speaker_id for i, _ in ready],
+            [batch[i].length_scale for i, _ in ready])
+        for (i, _), audio in zip(ready, audios):
+            results[i] = audio
+
+
+class SynthesisServer:
+    def __init__(self, synthesizer: BatchingSynthesizer, cfg_name: str) -> None:
+        self.synthesizer = synthesizer
+        self.cfg_name = cfg_name
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            status, content_type, body = await self._respond(reader)
+        except Exception as exc:
+            logger.exception("Request failed")
+            status, content_type, body = _json(500, {"error": str(exc)})
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                  405: "Method Not Allowed", 413: "Payload Too Large"}.get(status, "Internal Server Error")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\n"
+                     f"Content-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     "Connection: close\r\n\r\n".encode("latin-1") + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, reader: asyncio.StreamReader) -> Tuple[int, str, bytes]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            return _json(400, {"error": "malformed request line"})
+        method, target = request_line[0], request_line[1]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        if url.path == "/stats":
+            return _json(200, {"batches": self.synthesizer.batches, "requests": self.synthesizer.requests})
+        if url.path != "/synthesize":
+            return _json(404, {"error": f"unknown path {url.path}"})
+        if method == "GET":
+            params = dict(parse_qsl(url.query))
+        elif method == "POST":
+            try:
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                return _json(400, {"error": "invalid Content-Length"})
+            if length < 0:
+                return _json(400, {"error": "invalid Content-Length"})
+            if length > MAX_BODY_BYTES:
+                return _json(413, {"error": "request body too large"})
+            try:
+                params = json.loads(await reader.readexactly(length) or b"{}")
+            except asyncio.IncompleteReadError:
+                return _json(400, {"error": "request body shorter than Content-Length"})
+            except ValueError as exc:
+                return _json(400, {"error": f"invalid JSON: {exc}"})
+        else:
+            return _json(405, {"error": f"unsupported method {method}"})
+        if not isinstance(params, dict):
+            return _json(400, {"error": "request body must be a JSON object"})
+
+        text = str(params.get("text", "")).replace("\n", " ").strip()
+        if not text:
+            return _json(400, {"error": "text is required"})
+        try:
+            speaker_id = synthesis.resolve_speaker(self.cfg_name, str(params.get("speaker", "0")))
+            length_scale = float(params.get("speed", 1.0))
+        except (TypeError, ValueError) as exc:
+            return _json(400, {"error": str(exc)})
+        if not (math.isfinite(length_scale) and MIN_SPEED <= length_scale <= MAX_SPEED):
+            return _json(400, {"error": f"speed must be between {MIN_SPEED} and {MAX_SPEED}"})
+
+        audio = await self.synthesizer.synthesize(text, speaker_id, length_scale)
+        buf = io.BytesIO()
+        sf.write(buf, audio, synthesis.SAMPLE_RATE, format="WAV", subtype="PCM_16")
+        return 200, "audio/wav", buf.getvalue()
+
+
+def _json(status: int, payload: dict) -> Tuple[int, str, bytes]:
+    return status, "application/json", json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+async def serve(args: argparse.Namespace) -> None:
+    preset = synthesis.preset_for_config(args.config.name)
+    model = synthesis.load_model(args.config, args.model, preset)
+    if args.attention_block_size is not None:
+        attentions.set_attention_block_size(model, args.attention_block_size)
+    model = synthesis.wrap_backend(model, args.backend, args.model, args.compile_cache, preset)
+    synthesizer = BatchingSynthesizer(model, preset, args.max_batch, args.batch_window_ms, args.batch_g2p)
+    handler = SynthesisServer(synthesizer, args.config.name)
+    server = await asyncio.start_server(handler.handle, args.host, args.port)
+    batcher = asyncio.create_task(synthesizer.run())
+    logger.info("Serving on http://%s:%d (max batch %d, window %.0f ms)",
+                args.host, args.port, args.max_batch, args.batch_window_ms)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher.cancel()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local HTTP synthesis server")
+    parser.add_argument("-c", "--config", type=Path, required=True, help="model config json")
+    parser.add_argument("-m", "--model", type=Path, required=True, help="G_*.pth checkpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=8, help="largest batch passed to infer")
+    parser.add_argument("--batch-window-ms", type=float, default=20.0,
+                        help="how long to wait for more requests before running a batch")
+    parser.add_argument("--backend", choices=synthesis.BACKENDS, default="eager", help="inference backend")
+    parser.add_argument("--compile-cache", type=Path, default=None,
+                        help="directory for compiled graphs and ONNX exports")
+    parser.add_argument("--batch-g2p", action="store_true",
+                        help="one OpenJTalk call per run of words; faster, phonemes may differ at word edges")
+    parser.add_argument("--attention-block-size", type=int, default=None,
+                        help="text encoder attention computed this many symbols at a time, bounding memory on "
+                             "long requests (0: dense; default: the config's model.attention_block_size)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
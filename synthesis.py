@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import torch
+
+import utils
+from models import SynthesizerTrn
+from presets import (CONFIG_TO_PRESET, CROSSFADE_MS, DEFAULT_SEED,
+                     MULTI_SPK_GROUPS, NOISE_SCALE, NOISE_SCALE_W, SAMPLE_RATE,
+                     SYMBOL_PRESETS, SymbolPreset, preset_for_config,
+                     resolve_speaker)
+from text import transform
+from text.cleaners import (japanese_batched_tokenization_cleaners,
+                           japanese_cleaners, japanese_cleaners2,
+                           japanese_tokenization_cleaners)
+
+# A sentence runs up to (and keeps) its closing punctuation.
+_sentence_re = re.compile(r'[^。！？!?…\n]+[。！？!?…]*|[。！？!?…]+')
+
+
+def cleaner_for_preset(preset: SymbolPreset, batch_g2p: bool = False):
+    """The preset's cleaner.
+
+    ``batch_g2p`` switches the tokenization cleaner to one OpenJTalk call per
+    run of katakana words.  That is faster, but OpenJTalk then sees the words
+    in context, so devoicing at word edges, and with it the phonemes, can
+    differ from the per-word cleaner.
+    """
+    tokenization = japanese_batched_tokenization_cleaners if batch_g2p else japanese_tokenization_cleaners
+    cleaner_map = {
+        1: tokenization,
+        2: japanese_cleaners,
+        3: japanese_cleaners2,
+        4: tokenization,
+    }
+    return cleaner_map.get(preset.id, tokenization)
+
+
+def clean_phonemes(text: str, preset: SymbolPreset, batch_g2p: bool = False) -> str:
+    """Run the preset's cleaner, giving the phoneme string fed to the model."""
+    return cleaner_for_preset(preset, batch_g2p)(text)
+
+
+def encode_phonemes(cleaned: str, preset: SymbolPreset) -> torch.LongTensor:
+    """Symbol IDs with blanks interspersed, via the preset's compiled encoder."""
+    return torch.from_numpy(transform.get_encoder(preset.symbols).encode(cleaned))
+
+
+def encode_batch(cleaned: List[str], preset: SymbolPreset):
+    """Padded ``(x, x_lengths)`` tensors for several cleaned strings."""
+    ids, lengths = transform.get_encoder(preset.symbols).encode_batch(cleaned)
+    return torch.from_numpy(ids), torch.from_numpy(lengths)
+
+
+def clean_text(text: str, preset: SymbolPreset, batch_g2p: bool = False) -> torch.LongTensor:
+    """Convert raw text to tensor according to preset symbols."""
+    return encode_phonemes(clean_phonemes(text, preset, batch_g2p), preset)
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text at Japanese sentence punctuation, dropping empty pieces."""
+    sentences = [m.group(0).strip() for m in _sentence_re.finditer(text)]
+    return [s for s in sentences if s]
+
+
+class SegmentJoiner:
+    """Joins separately synthesized segments with an equal-power crossfade.
+
+    ``push`` returns the audio that is final as soon as a segment arrives and
+    holds back only the crossfade tail, so the chunks can be played while
+    later segments are still being generated.  Concatenating every returned
+    chunk plus ``finish()`` gives the joined file.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, crossfade_ms: float = CROSSFADE_MS) -> None:
+        self.overlap = max(int(sample_rate * crossfade_ms / 1000), 0)
+        self._tail: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _fades(k: int):
+        t = (np.arange(k, dtype=np.float32) + 0.5) / k
+        return np.sin(t * math.pi / 2), np.cos(t * math.pi / 2)
+
+    def push(self, segment: np.ndarray) -> np.ndarray:
+        segment = np.asarray(segment, dtype=np.float32)
+        parts = []
+        if self._tail is not None:
+            k = min(len(self._tail), len(segment))
+            parts.append(self._tail[:len(self._tail) - k])
+            if k:
+                fade_in, fade_out = self._fades(k)
+                parts.append(self._tail[len(self._tail) - k:] * fade_out + segment[:k] * fade_in)
+            segment = segment[k:]
+        hold = min(self.overlap, len(segment))
+        parts.append(segment[:len(segment) - hold])
+        self._tail = segment[len(segment) - hold:]
+        return np.concatenate(parts)
+
+    def finish(self) -> np.ndarray:
+        tail = self._tail if self._tail is not None else np.zeros(0, dtype=np.float32)
+        self._tail = None
+        return tail
+
+
+# Marks checkpoints written by export_model.py.
+EXPORT_FORMAT = "vits-inference"
+EXPORT_VERSION = 1
+
+
+def build_model(hps, preset: SymbolPreset, inference_only: bool = False) -> SynthesizerTrn:
+    model = SynthesizerTrn(
+        len(preset.symbols),
+        hps.data.filter_length // 2 + 1,
+        hps.train.segment_size // hps.data.hop_length,
+        n_speakers=hps.data.n_speakers,
+        inference_only=inference_only,
+        **hps.model,
+    )
+    model.eval()
+    return model
+
+
+def export_checkpoint(cfg_path: Path, model: SynthesizerTrn, preset: SymbolPreset,
+                      half: bool = False) -> dict:
+    """Inference-only checkpoint for a model from ``load_model``.
+
+    The posterior encoder is dropped and the config and symbol preset are
+    embedded, so the file loads without the training checkpoint's extras.
+    Weight norm is folded here, once, so loading the export never folds.
+    """
+    model.remove_weight_norm()
+    state = {k: v for k, v in model.state_dict().items() if not k.startswith("enc_q.")}
+    if half:
+        state = {k: v.half() if v.is_floating_point() else v for k, v in state.items()}
+    return {
+        "format": EXPORT_FORMAT,
+        "version": EXPORT_VERSION,
+        "config": Path(cfg_path).read_text(encoding="utf-8"),
+        "preset": {"id": preset.id, "symbols": list(preset.symbols)},
+        "dtype": "float16" if half else "float32",
+        "weight_norm_folded": True,
+        "model": state,
+    }
+
+
+def weight_norm_folded(state: dict) -> bool:
+    """Whether ``state`` holds plain conv weights rather than weight norm's ``weight_g``/``weight_v``."""
+    return not any(k.endswith(".weight_g") for k in state)
+
+
+def _assign_weights(model: SynthesizerTrn, state: dict) -> None:
+    # Folding first makes the model's keys match a folded state, so the mapped
+    # conv weights are assigned as they are and prepare_for_inference has
+    # nothing left to fold.
+    if weight_norm_folded(state):
+        model.remove_weight_norm()
+    utils.load_model_state(model, state, assign=True)
+
+
+def _model_from_export(checkpoint: dict, preset: Optional[SymbolPreset]) -> SynthesizerTrn:
+    if checkpoint.get("version") != EXPORT_VERSION:
+        raise ValueError(f"Unsupported export version {checkpoint.get('version')}")
+    embedded = SymbolPreset(checkpoint["preset"]["id"], checkpoint["preset"]["symbols"])
+    if preset is not None and list(preset.symbols) != embedded.symbols:
+        raise ValueError(f"Model was exported for symbol preset {embedded.id}, config uses preset {preset.id}")
+    hps = utils.HParams(**json.loads(checkpoint["config"]))
+    if not checkpoint.get("weight_norm_folded", weight_norm_folded(checkpoint["model"])):
+        raise ValueError("Exported model still has weight norm, export it again with export_model.py")
+    model = build_model(hps, embedded, inference_only=True)
+    model.remove_weight_norm()
+    missing = model.state_dict().keys() - checkpoint["model"].keys()
+    if missing:
+        raise ValueError(f"Exported model is missing {len(missing)} weights, e.g. {min(missing)}")
+    # float16 exports are copied (and upcast) into the float32 parameters.
+    _assign_weights(model, checkpoint["model"])
+    return model.prepare_for_inference()
+
+
+def check_inputs(model: SynthesizerTrn, length: int = 48):
+    """A fixed ``(x, x_lengths, sid)`` for ``prepare_for_inference`` to verify with."""
+    x = (torch.arange(length) % (model.n_vocab - 1) + 1).unsqueeze(0)
+    sid = torch.LongTensor([0]) if hasattr(model, "emb_g") else None
+    return x, torch.LongTensor([length]), sid
+
+
+def load_model(cfg_path: Path, model_path: Path,
+               preset: Optional[SymbolPreset] = None, mmap: bool = True,
+               verify: bool = False) -> SynthesizerTrn:
+    """Load a training ``G_*.pth`` or a checkpoint written by export_model.py.
+
+    The file is memory-mapped and the mapped tensors become the model's
+    weights.  Training checkpoints skip the posterior encoder and never
+    touch their optimizer state, but their weight norm is folded by
+    ``prepare_for_inference``, which computes new conv weights in private
+    memory; only the remaining weights (text encoder, embeddings, biases)
+    stay mapped and shared between processes.  ``verify`` checks that
+    folding left the output unchanged.  Exports from export_model.py, and
+    any checkpoint saved with weight norm already folded, skip the fold, so
+    every float32 weight stays mapped.
+    """
+    checkpoint = utils.load_checkpoint_dict(str(model_path), mmap=mmap)
+    if checkpoint.get("format") == EXPORT_FORMAT:
+        return _model_from_export(checkpoint, preset)
+    hps = utils.get_hparams_from_file(str(cfg_path))
+    model = build_model(hps, preset or preset_for_config(Path(cfg_path).name), inference_only=True)
+    _assign_weights(model, checkpoint["model"])
+    return model.prepare_for_inference(check_inputs(model) if verify else None)
+
+
+BACKENDS = ("eager", "compiled", "onnx", "int8", "bf16")
+
+
+def quantize(model: SynthesizerTrn, preset: Optional[SymbolPreset] = None) -> SynthesizerTrn:
+    """int8 copy of ``model`` calibrated on quantization.CALIBRATION_TEXTS for every speaker."""
+    import quantization
+    if preset is not None:
+        sequences = [clean_text(text, preset) for text in quantization.CALIBRATION_TEXTS]
+    else:
+        sequences = [check_inputs(model, length)[0][0] for length in (24, 48, 96)]
+    speakers = list(range(model.n_speakers)) if hasattr(model, "emb_g") else [None]
+    return quantization.quantize_model(model, quantization.calibration_inputs(model, sequences, speakers))
+
+
+def wrap_backend(model: SynthesizerTrn, backend: str = "eager",
+                 model_path: Optional[Path] = None, cache_dir: Optional[Path] = None,
+                 preset: Optional[SymbolPreset] = None):
+    """Wrap a loaded model so ``infer`` runs on the chosen backend.
+
+    ``compiled`` traces TorchScript graphs (see compiled_infer.py) and keeps
+    them in ``cache_dir`` under the checkpoint's digest.  ``onnx`` runs an
+    export from export_onnx.py with onnxruntime, exporting into
+    ``cache_dir`` (or next to the checkpoint) on first use.  ``int8``
+    returns a quantized copy (see quantization.py), calibrated with
+    ``preset``'s cleaner when one is given.  ``bf16`` runs the model under
+    bfloat16 autocast (see mixed_precision.py) on CPUs with native support.
+    """
+    if backend == "eager":
+        return model
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if backend == "int8":
+        return quantize(model, preset)
+    if backend == "bf16":
+        import mixed_precision
+        return mixed_precision.bf16(model)
+    import audio_cache
+    digest = audio_cache.checkpoint_digest(model_path) if model_path is not None else None
+    if backend == "compiled":
+        import compiled_infer
+        return compiled_infer.CompiledSynthesizer(model, cache_dir, digest)
+    import export_onnx
+    import onnx_backend
+    if digest is None:
+        raise ValueError("The onnx backend needs the checkpoint path to cache its export")
+    model_path = Path(model_path)
+    directory = Path(cache_dir or model_path.parent) / f"{model_path.stem}-{digest[:16]}.onnx"
+    if not (directory / "meta.json").exists():
+        export_onnx.export_onnx(model, directory, overwrite=False)
+    return onnx_backend.OnnxSynthesizer(directory)
+
+
+def synthesize(model: SynthesizerTrn, stn: torch.LongTensor,
+               speaker_id: Optional[int] = None,
+               length_scale: float = 1.0,
+               noise_scale: float = NOISE_SCALE,
+               noise_scale_w: float = NOISE_SCALE_W,
+               seed: Optional[int] = None) -> np.ndarray:
+    """Run ``model.infer`` on one cleaned sequence and return mono float audio.
+
+    With ``seed`` set the noise draws are reproducible, which is what makes
+    results cacheable.
+    """
+    if seed is not None:
+        torch.manual_seed(seed)
+    with torch.no_grad():
+        x_tst = stn.unsqueeze(0)
+        x_len = torch.LongTensor([stn.size(0)])
+        sid = torch.LongTensor([speaker_id]) if speaker_id is not None else None
+        audio = model.infer(x_tst, x_len, sid=sid,
+                            noise_scale=noise_scale,
+                            noise_scale_w=noise_scale_w,
+                            length_scale=length_scale)[0][0, 0]
+    return audio.cpu().numpy()
+
+
+@torch.no_grad()
+def synthesize_batch(model: SynthesizerTrn, x: torch.LongTensor,
+                     x_lengths: torch.LongTensor,
+                     speaker_ids: List[Optional[int]],
+                     length_scales: List[float],
+                     noise_scale: float = NOISE_SCALE,
+                     noise_scale_w: float = NOISE_SCALE_W) -> List[np.ndarray]:
+    """Run a padded batch from ``encode_batch`` through one ``model.infer`` call.
+
+    ``length_scale`` may differ per item; it is broadcast over the duration
+    tensor.  Each output is trimmed to its own predicted length.
+    """
+    sid = None
+    if speaker_ids[0] is not None:
+        sid = torch.LongTensor(speaker_ids)
+    scales = torch.tensor(length_scales, dtype=torch.float32).view(-1, 1, 1)
+    hop_length = int(np.prod(model.upsample_rates))
+    with torch.no_grad():
+        o, _, y_mask, _ = model.infer(x, x_lengths, sid=sid,
+                                      noise_scale=noise_scale,
+                                      noise_scale_w=noise_scale_w,
+                                      length_scale=scales)
+    n_samples = (y_mask.sum([1, 2]).long() * hop_length).tolist()
+    audio = o[:, 0].cpu().numpy()
+    return [audio[i, :n] for i, n in enumerate(n_samples)]
@@ -0,0 +1,33 @@
+import json
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import synthesis  # noqa: E402
+import utils  # noqa: E402
+
+CONFIGS = Path(__file__).resolve().parent.parent / "configs"
+
+
+def _configs(multi_speaker):
+    for config in sorted(CONFIGS.glob("*.json")):
+        text = config.read_text(encoding="utf-8")
+        if text.strip() and (json.loads(text)["data"]["n_speakers"] > 0) == multi_speaker:
+            yield config
+
+
+@pytest.mark.parametrize("config", list(_configs(multi_speaker=False)), ids=lambda c: c.stem)
+def test_load_single_speaker_model(config, tmp_path):
+    hps = utils.get_hparams_from_file(str(config))
+    model = synthesis.build_model(hps, synthesis.preset_for_config(config.name))
+    model_path = tmp_path / f"G_{config.stem}.pth"
+    torch.save({"model": model.state_dict(), "iteration": 0}, model_path)
+
+    loaded = synthesis.load_model(config, model_path, verify=True)
+    x, x_lengths, sid = synthesis.check_inputs(loaded)
+    assert sid is None
+    with torch.no_grad():
+        audio = loaded.infer(x, x_lengths, sid=sid)[0]
+    assert audio.shape[0] == 1 and audio.shape[-1] > 0
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import synthesis  # noqa: E402
+import utils  # noqa: E402
+
+CONFIGS = Path(__file__).resolve().parent.parent / "configs"
+
+
+def test_int8_output_tracks_float():
+    config = CONFIGS / "kanade.json"
+    hps = utils.get_hparams_from_file(str(config))
+    torch.manual_seed(0)
+    model = synthesis.build_model(hps, synthesis.preset_for_config(config.name), inference_only=True)
+    model.prepare_for_inference()
+    quantized = synthesis.quantize(model)
+    x, x_lengths, sid = synthesis.check_inputs(model, 30)
+
+    outputs = []
+    for engine in (model, quantized):
+        torch.manual_seed(1)
+        with torch.no_grad():
+            outputs.append(engine.infer(x, x_lengths, sid=sid)[0])
+    expected, actual = outputs
+    assert actual.shape == expected.shape
+    snr = 10 * torch.log10(expected.pow(2).sum() / (actual - expected).pow(2).sum())
+    assert snr.item() > 30
@@ -1,9 +1,9 @@
 import re
+import threading
 from unidecode import unidecode
 import pyopenjtalk
-from janome.tokenizer import Tokenizer
-import sys
-import os
+from text.fullcontext import labels_to_romaji_with_accent
+from text.memo import memoize
 
 # Regular expression matching Japanese without punctuation marks:
 _japanese_characters = re.compile(
@@ -13,38 +13,149 @@ _japanese_characters = re.compile(
 _japanese_marks = re.compile(
     r'[^A-Za-z\d\u3005\u3040-\u30ff\u4e00-\u9fff\uff11-\uff19\uff21-\uff3a\uff41-\uff5a\uff66-\uff9d]')
 
-def resource_path(relative_path):
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.abspath(relative_path)
+# Tokenizer for Japanese, created on first use by _get_tokenizer().
+_tokenizer = None
 
-dic_dir = resource_path("janome/sysdic")
-# Tokenizer for Japanese
-tokenizer = Tokenizer()
+# Neither OpenJTalk nor Janome is safe to call from several threads at once.
+_openjtalk_lock = threading.Lock()
+_janome_lock = threading.Lock()
 
-def japanese_tokenization_cleaners(text):
-    '''Pipeline for tokenizing Japanese text.'''
+
+def _get_tokenizer():
+    '''Build the Janome tokenizer on first use.
+
+    Only japanese_tokenization_cleaners needs it, so configs using the
+    pyopenjtalk-only cleaners never load the dictionary.  The system
+    dictionary is memory-mapped, so worker processes share one page-cache
+    copy instead of each unpickling a private one.  Janome finds the
+    dictionary inside its own package, which the PyInstaller spec bundles as
+    janome/sysdic.
+    '''
+    global _tokenizer
+    if _tokenizer is None:
+        from janome.tokenizer import Tokenizer
+        _tokenizer = Tokenizer(mmap=True)
+    return _tokenizer
+
+
+@memoize('tokenize')
+def _tokenize(text):
+    '''Janome readings of a text, falling back to the surface form.'''
+    with _janome_lock:
+        tokens = list(_get_tokenizer().tokenize(text))
+    return tuple(token.phonetic if token.phonetic != '*' else token.surface
+                 for token in tokens)
+
+
+@memoize('g2p', maxsize=65536)
+def _g2p(word):
+    with _openjtalk_lock:
+        return pyopenjtalk.g2p(word, kana=False)
+
+
+@memoize('fullcontext')
+def _extract_fullcontext(sentence):
+    with _openjtalk_lock:
+        return tuple(pyopenjtalk.extract_fullcontext(sentence))
+
+
+# Katakana readings that can be split back into words by counting moras:
+_katakana_word = re.compile(r'[\u30a1-\u30fa\u30fc]+')
+
+# Small kana that share a mora with the kana before them:
+_small_kana = frozenset('ァィゥェォャュョヮ')
+
+# OpenJTalk phonemes that close a mora:
+_mora_end = frozenset('aiueoAIUEO') | {'N', 'cl'}
+
+
+def _count_moras(word):
+    return sum(1 for c in word if c not in _small_kana)
+
+
+def _split_moras(phonemes):
+    '''Groups space-separated g2p output into moras, or None if it ends mid-mora.'''
+    moras, current = [], []
+    for phoneme in phonemes.split(' '):
+        current.append(phoneme)
+        if phoneme in _mora_end:
+            moras.append(''.join(current))
+            current = []
+    return None if current else moras
+
+
+def _g2p_run(words):
+    '''Phonemes for consecutive katakana words from a single OpenJTalk call.
+
+    The output is split back into words by mora count; when the counts do not
+    line up, each word gets its own call as in the unbatched cleaner.
+    '''
+    if len(words) > 1:
+        counts = [_count_moras(word) for word in words]
+        moras = _split_moras(_g2p(''.join(words)))
+        if all(counts) and moras is not None and len(moras) == sum(counts):
+            result, i = [], 0
+            for n in counts:
+                result.append(''.join(moras[i:i + n]))
+                i += n
+            return result
+    return [_g2p(word).replace(' ', '') for word in words]
+
+
+def japanese_tokenization_cleaners(text, batch_g2p=False):
+    '''Pipeline for tokenizing Japanese text.
+
+    With batch_g2p, runs of consecutive katakana readings are converted with
+    one OpenJTalk call instead of one per word.  OpenJTalk then sees the
+    words in context, so vowel devoicing at word edges can differ.
+    '''
     words = []
-    for token in tokenizer.tokenize(text):
-        if token.phonetic != '*':
-            words.append(token.phonetic)
-        else:
-            words.append(token.surface)
-    text = ''
-    for word in words:
+    for word in _tokenize(text):
         if re.match(_japanese_characters, word):
             if word[0] == '\u30fc':
                 continue
-            if len(text) > 0:
-                text += ' '
-            text += pyopenjtalk.g2p(word, kana=False).replace(' ', '')
+            words.append((True, word))
         else:
-            text += unidecode(word).replace(' ', '')
+            words.append((False, unidecode(word).replace(' ', '')))
+
+    phonemes = []
+    run = []
+    for is_japanese, word in words:
+        if batch_g2p and is_japanese and _katakana_word.fullmatch(word):
+            run.append(word)
+            continue
+        if run:
+            phonemes.extend((True, p) for p in _g2p_run(run))
+            run = []
+        if is_japanese:
+            phonemes.append((True, _g2p(word).replace(' ', '')))
+        else:
+            phonemes.append((False, word))
+    if run:
+        phonemes.extend((True, p) for p in _g2p_run(run))
+
+    parts = []
+    length = 0
+    for is_japanese, p in phonemes:
+        if is_japanese and length > 0:
+            parts.append(' ')
+            length += 1
+        parts.append(p)
+        length += len(p)
+    text = ''.join(parts)
     if re.match('[A-Za-z]', text[-1]):
         text += '.'
     return text
 
 
+def japanese_batched_tokenization_cleaners(text):
+    '''japanese_tokenization_cleaners with batched G2P (--batch-g2p / the GUI's 批量G2P option).
+
+    Output can differ from the per-word cleaner, see japanese_tokenization_cleaners.
+    '''
+    return japanese_tokenization_cleaners(text, batch_g2p=True)
+
+
 def japanese_to_romaji_with_accent(text):
     '''Reference https://r9y9.github.io/ttslearn/latest/notebooks/ch10_Recipe-Tacotron.html'''
     sentences = re.split(_japanese_marks, text)
@@ -54,35 +165,17 @@ def japanese_to_romaji_with_accent(text):
         if re.match(_japanese_characters, sentence):
             if text != '':
                 text += ' '
-            labels = pyopenjtalk.extract_fullcontext(sentence)
-            for n, label in enumerate(labels):
-                phoneme = re.search(r'\-([^\+]*)\+', label).group(1)
-                if phoneme not in ['sil', 'pau']:
-                    text += phoneme.replace('ch', 'ʧ').replace('sh', 'ʃ').replace('cl', 'Q')
-                else:
-                    continue
-                n_moras = int(re.search(r'/F:(\d+)_', label).group(1))
-                a1 = int(re.search(r"/A:(\-?[0-9]+)\+", label).group(1))
-                a2 = int(re.search(r"\+(\d+)\+", label).group(1))
-                a3 = int(re.search(r"\+(\d+)/", label).group(1))
-                if re.search(r'\-([^\+]*)\+', labels[n + 1]).group(1) in ['sil', 'pau']:
-                    a2_next = -1
-                else:
-                    a2_next = int(re.search(r"\+(\d+)\+", labels[n + 1]).group(1))
-                # Accent phrase boundary
-                if a3 == 1 and a2_next == 1:
-                    text += ' '
-                # Falling
-                elif a1 == 0 and a2_next == a2 + 1 and a2 != n_moras:
-                    text += '↓'
-                # Rising
-                elif a2 == 1 and a2_next == 2:
-                    text += '↑'
+            text += _sentence_to_romaji_with_accent(sentence)
         if i < len(marks):
             text += unidecode(marks[i]).replace(' ', '')
     return text
 
 
+@memoize('romaji_with_accent')
+def _sentence_to_romaji_with_accent(sentence):
+    return labels_to_romaji_with_accent(_extract_fullcontext(sentence))
+
+
 def japanese_cleaners(text):
     text = japanese_to_romaji_with_accent(text)
     if re.match('[A-Za-z]', text[-1]):
@@ -0,0 +1,79 @@
+''' Single-pass parsing of OpenJTalk full-context labels for the accent cleaners. '''
+import re
+from collections import namedtuple
+
+# One match per label line: the current phoneme (p3), the A field
+# (a1 = accent position relative to the nucleus, a2 = mora position in the
+# accent phrase, a3 = moras left in it) and f1 = moras in the accent phrase.
+_label_re = re.compile(
+    r'^[^-\n]*-([^+\n]*)\+[^\n]*?'
+    r'/A:(-?\d+|xx)\+(\d+|xx)\+(\d+|xx)/'
+    r'[^\n]*?/F:(\d+|xx)_[^\n]*$',
+    re.MULTILINE)
+
+# Value stored for 'xx' fields, which only occur on pause labels.
+_MISSING = -1
+
+_PAUSES = frozenset(('sil', 'pau'))
+
+LabelColumns = namedtuple('LabelColumns', ['phoneme', 'is_pause', 'a1', 'a2', 'a3', 'f1'])
+
+
+def _int(value):
+    return _MISSING if value == 'xx' else int(value)
+
+
+def parse_labels(labels):
+    '''Parses all labels of a sentence into columns with one regex pass.'''
+    matches = _label_re.findall('\n'.join(labels))
+    if len(matches) != len(labels):
+        raise ValueError(f'Could not parse full-context labels ({len(matches)} of {len(labels)} matched)')
+    if not matches:
+        return LabelColumns([], [], [], [], [], [])
+    phoneme, a1, a2, a3, f1 = zip(*matches)
+    return LabelColumns(
+        phoneme=list(phoneme),
+        is_pause=[p in _PAUSES for p in phoneme],
+        a1=list(map(_int, a1)), a2=list(map(_int, a2)),
+        a3=list(map(_int, a3)), f1=list(map(_int, f1)))
+
+
+def accent_marks(cols):
+    '''Mark to write after each label: ' ', '↓', '↑', or '' for none.
+
+    The next label's a2 counts as -1 when it is a pause or there is none.
+    '''
+    a2_next = [-1 if pause else a2 for pause, a2 in zip(cols.is_pause[1:], cols.a2[1:])]
+    a2_next.append(-1)
+    marks = []
+    for a1, a2, a3, f1, nxt in zip(cols.a1, cols.a2, cols.a3, cols.f1, a2_next):
+        # Accent phrase boundary
+        if a3 == 1 and nxt == 1:
+            marks.append(' ')
+        # Falling
+        elif a1 == 0 and nxt == a2 + 1 and a2 != f1:
+            marks.append('↓')
+        # Rising
+        elif a2 == 1 and nxt == 2:
+            marks.append('↑')
+        else:
+            marks.append('')
+    return marks
+
+
+_phoneme_symbols = {}
+
+
+def _phoneme_symbol(phoneme):
+    symbol = _phoneme_symbols.get(phoneme)
+    if symbol is None:
+        symbol = _phoneme_symbols[phoneme] = phoneme.replace('ch', 'ʧ').replace('sh', 'ʃ').replace('cl', 'Q')
+    return symbol
+
+
+def labels_to_romaji_with_accent(labels):
+    '''Romaji with accent marks for the labels of one sentence.'''
+    cols = parse_labels(labels)
+    marks = accent_marks(cols)
+    return ''.join(_phoneme_symbol(p) + m
+                   for p, m, pause in zip(cols.phoneme, marks, cols.is_pause) if not pause)
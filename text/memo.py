@@ -0,0 +1,140 @@
+''' Bounded, thread-safe memoization for the text cleaners. '''
+import atexit
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_FORMAT_VERSION = 1
+_registry = {}
+# Loaded tables whose memo has not been registered yet (its module is
+# imported later, e.g. on a worker thread); applied on registration.
+_pending = {}
+_registry_lock = threading.Lock()
+
+
+class LRUMemo:
+    '''Memoizes a single-argument function with a bounded LRU table.
+
+    The table is guarded by a lock, but the wrapped function runs outside it,
+    so concurrent misses on different keys do not serialize here.  Callers
+    wrapping a non-reentrant library should take their own lock inside.
+    '''
+
+    def __init__(self, func, maxsize, name):
+        self.func = func
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._table = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, arg):
+        with self._lock:
+            try:
+                value = self._table[arg]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._table.move_to_end(arg)
+                self.hits += 1
+                return value
+        value = self.func(arg)
+        with self._lock:
+            self._table[arg] = value
+            self._table.move_to_end(arg)
+            while len(self._table) > self.maxsize:
+                self._table.popitem(last=False)
+        return value
+
+    def items(self):
+        with self._lock:
+            return list(self._table.items())
+
+    def update(self, items):
+        with self._lock:
+            for key, value in items:
+                self._table[key] = value
+            while len(self._table) > self.maxsize:
+                self._table.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._table.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._table), 'maxsize': self.maxsize}
+
+
+def memoize(name, maxsize=4096):
+    '''Decorator registering a named LRUMemo so it can be persisted.'''
+    def wrap(func):
+        memo = LRUMemo(func, maxsize, name)
+        with _registry_lock:
+            _registry[name] = memo
+            items = _pending.pop(name, None)
+        if items is not None:
+            memo.update(items)
+        return memo
+    return wrap
+
+
+def cache_info():
+    return {name: memo.info() for name, memo in _registry.items()}
+
+
+def clear():
+    for memo in _registry.values():
+        memo.clear()
+
+
+def save(path):
+    with _registry_lock:
+        # Tables never registered this session are written back unchanged.
+        tables = dict(_pending)
+        memos = list(_registry.items())
+    tables.update((name, memo.items()) for name, memo in memos)
+    data = {'version': _FORMAT_VERSION, 'tables': tables}
+    tmp = f'{path}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as exc:
+        logger.warning('Could not save text cache to %s: %s', path, exc)
+
+
+def load(path):
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+    except FileNotFoundError:
+        return
+    except Exception as exc:
+        logger.warning('Ignoring unreadable text cache %s: %s', path, exc)
+        return
+    if data.get('version') != _FORMAT_VERSION:
+        return
+    for name, items in data['tables'].items():
+        with _registry_lock:
+            memo = _registry.get(name)
+            if memo is None:
+                _pending[name] = items
+        if memo is not None:
+            memo.update(items)
+
+
+def enable_persistence(path):
+    '''Load cached results from ``path`` now and write them back at exit.
+
+    Memos registered later, when their module is imported, still receive
+    their saved table.
+    '''
+    load(path)
+    atexit.register(save, path)
@@ -1,10 +1,96 @@
 """ from https://github.com/keithito/tacotron """
+import logging
+
+import numpy as np
+
 from text import cleaners
 
+logger = logging.getLogger(__name__)
+
+
+class SymbolEncoder:
+  '''Symbol table for one symbol list, compiled once and reused.
+
+  Every symbol is a single code point, so conversion is a lookup of the
+  string's code points in a dense table.  ``encode`` writes the IDs straight
+  into a preallocated int64 array, optionally with the blank (ID 0)
+  interspersed the way ``commons.intersperse`` does.  Characters outside the
+  symbol list are dropped and reported instead of raising ``KeyError``.
+  '''
+
+  def __init__(self, symbols, add_blank=True, blank_id=0):
+    self.symbols = tuple(symbols)
+    self.add_blank = add_blank
+    self.blank_id = blank_id
+    # Mappings from symbol to numeric ID and vice versa:
+    self.symbol_to_id = {s: i for i, s in enumerate(self.symbols)}
+    self.id_to_symbol = {i: s for i, s in enumerate(self.symbols)}
+    # The last slot is a sentinel that every out-of-range code point maps to.
+    max_code = max(ord(s) for s in self.symbol_to_id)
+    self._lookup = np.full(max_code + 2, -1, dtype=np.int64)
+    for s, i in self.symbol_to_id.items():
+      self._lookup[ord(s)] = i
+
+  def _ids(self, text):
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    ids = self._lookup[np.minimum(codes, len(self._lookup) - 1)]
+    unknown = ids < 0
+    if unknown.any():
+      missing = sorted({text[i] for i in np.flatnonzero(unknown)})
+      logger.warning('Dropping unknown symbols %s', missing)
+      ids = ids[~unknown]
+    return ids
+
+  def encoded_length(self, n):
+    return 2 * n + 1 if self.add_blank else n
 
+  def unknown_symbols(self, text):
+    '''Characters of ``text`` that are not in the symbol list.'''
+    return sorted({c for c in text if c not in self.symbol_to_id})
 
-# Mappings from symbol to numeric ID and vice versa:
+  def encode(self, text, out=None):
+    '''Converts a cleaned string to an int64 array of symbol IDs.'''
+    ids = self._ids(text)
+    if out is None:
+      out = np.empty(self.encoded_length(len(ids)), dtype=np.int64)
+    if self.add_blank:
+      out[0::2] = self.blank_id
+      out[1::2] = ids
+    else:
+      out[:] = ids
+    return out
 
+  def encode_batch(self, texts):
+    '''Encodes several cleaned strings into one zero-padded [b, t] array.
+
+    Returns:
+      (ids, lengths) with ``ids`` of shape [len(texts), max length]
+    '''
+    ids = [self._ids(text) for text in texts]
+    lengths = np.array([self.encoded_length(len(i)) for i in ids], dtype=np.int64)
+    batch = np.zeros((len(texts), int(lengths.max(initial=0))), dtype=np.int64)
+    for row, (seq, length) in enumerate(zip(ids, lengths)):
+      if self.add_blank:
+        batch[row, :length] = self.blank_id
+        batch[row, 1:length:2] = seq
+      else:
+        batch[row, :length] = seq
+    return batch, lengths
+
+  def decode(self, sequence):
+    return ''.join(self.id_to_symbol[i] for i in sequence)
+
+
+_encoders = {}
+
+
+def get_encoder(symbols, add_blank=True):
+  '''Returns the compiled encoder for a symbol list, building it once.'''
+  key = (tuple(symbols), add_blank)
+  encoder = _encoders.get(key)
+  if encoder is None:
+    encoder = _encoders[key] = SymbolEncoder(key[0], add_blank=add_blank)
+  return encoder
 
 
 def text_to_sequence(text, cleaner_names,symbols):
@@ -15,15 +101,9 @@ def text_to_sequence(text, cleaner_names,symbols):
     Returns:
       List of integers corresponding to the symbols in the text
   '''
-  sequence = []
-
-  _symbol_to_id = {s: i for i, s in enumerate(symbols)}
-  _id_to_symbol = {i: s for i, s in enumerate(symbols)}
-
+  _symbol_to_id = get_encoder(symbols, add_blank=False).symbol_to_id
   clean_text = _clean_text(text, cleaner_names)
-  for symbol in clean_text:
-    symbol_id = _symbol_to_id[symbol]
-    sequence += [symbol_id]
+  sequence = [_symbol_to_id[symbol] for symbol in clean_text]
   return sequence
 
 
@@ -34,8 +114,7 @@ def cleaned_text_to_sequence(cleaned_text,symbols):
     Returns:
       List of integers corresponding to the symbols in the text
   '''
-  _symbol_to_id = {s: i for i, s in enumerate(symbols)}
-  _id_to_symbol = {i: s for i, s in enumerate(symbols)}
+  _symbol_to_id = get_encoder(symbols, add_blank=False).symbol_to_id
   sequence = [_symbol_to_id[symbol] for symbol in cleaned_text]
   return sequence
 
@@ -43,13 +122,7 @@ def cleaned_text_to_sequence(cleaned_text,symbols):
 def sequence_to_text(sequence,symbols):
 
   '''Converts a sequence of IDs back to a string'''
-  _symbol_to_id = {s: i for i, s in enumerate(symbols)}
-  _id_to_symbol = {i: s for i, s in enumerate(symbols)}
-  result = ''
-  for symbol_id in sequence:
-    s = _id_to_symbol[symbol_id]
-    result += s
-  return result
+  return get_encoder(symbols, add_blank=False).decode(sequence)
 
 
 def _clean_text(text, cleaner_names):
@@ -20,6 +20,13 @@ def piecewise_rational_quadratic_transform(inputs,
                                            min_bin_height=DEFAULT_MIN_BIN_HEIGHT,
                                            min_derivative=DEFAULT_MIN_DERIVATIVE):
 
+    # The spline divides by bin widths and derivatives that bfloat16 cannot
+    # resolve, so it always runs in float32, also under autocast.
+    inputs = inputs.float()
+    unnormalized_widths = unnormalized_widths.float()
+    unnormalized_heights = unnormalized_heights.float()
+    unnormalized_derivatives = unnormalized_derivatives.float()
+
     if tails is None:
         spline_fn = rational_quadratic_spline
         spline_kwargs = {}
@@ -6,7 +6,6 @@ import logging
 import json
 import subprocess
 import numpy as np
-from scipy.io.wavfile import read
 import torch
 
 MATPLOTLIB_FLAG = False
@@ -15,34 +14,52 @@ logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 logger = logging
 
 
+def load_checkpoint_dict(checkpoint_path, mmap=True):
+  """torch.load onto the CPU, memory-mapping the file when its format allows.
+
+  Mapped tensors are paged in from the file on first access, and processes
+  mapping the same checkpoint share those pages through the page cache.
+  """
+  if mmap:
+    try:
+      return torch.load(checkpoint_path, map_location='cpu', mmap=True)
+    except RuntimeError:
+      # Checkpoints in the legacy (pre zip) serialization format can't be mapped.
+      logger.info("%s can't be memory-mapped, loading it into memory" % checkpoint_path)
+  return torch.load(checkpoint_path, map_location='cpu')
+
+
 def load_checkpoint(checkpoint_path, model, optimizer=None):
   assert os.path.isfile(checkpoint_path)
-  checkpoint_dict = torch.load(checkpoint_path, map_location='cpu')
+  checkpoint_dict = load_checkpoint_dict(checkpoint_path)
   iteration = checkpoint_dict['iteration']
   learning_rate = checkpoint_dict['learning_rate']
   if optimizer is not None:
     optimizer.load_state_dict(checkpoint_dict['optimizer'])
-  saved_state_dict = checkpoint_dict['model']
-  if hasattr(model, 'module'):
-    state_dict = model.module.state_dict()
-  else:
-    state_dict = model.state_dict()
-  new_state_dict= {}
-  for k, v in state_dict.items():
-    try:
-      new_state_dict[k] = saved_state_dict[k]
-    except:
-      logger.info("%s is not in the checkpoint" % k)
-      new_state_dict[k] = v
-  if hasattr(model, 'module'):
-    model.module.load_state_dict(new_state_dict)
-  else:
-    model.load_state_dict(new_state_dict)
+  load_model_state(model, checkpoint_dict['model'])
   logger.info("Loaded checkpoint '{}' (iteration {})" .format(
     checkpoint_path, iteration))
   return model, optimizer, learning_rate, iteration
 
 
+def load_model_state(model, saved_state_dict, assign=False):
+  """Copy saved weights into model, keeping its own value for missing keys.
+
+  With assign, the saved tensors become the model's parameters instead of
+  being copied, so weights from a memory-mapped checkpoint stay mapped.  This
+  only happens when every dtype matches; otherwise the weights are copied.
+  """
+  if hasattr(model, 'module'):
+    model = model.module
+  state_dict = model.state_dict()
+  for k in sorted(state_dict.keys() - saved_state_dict.keys()):
+    logger.info("%s is not in the checkpoint" % k)
+  new_state_dict = {k: saved_state_dict[k] for k in state_dict.keys() & saved_state_dict.keys()}
+  assign = assign and all(v.dtype == state_dict[k].dtype for k, v in new_state_dict.items())
+  model.load_state_dict(new_state_dict, strict=False, assign=assign)
+  return model
+
+
 def save_checkpoint(model, optimizer, learning_rate, iteration, checkpoint_path):
   logger.info("Saving model and optimizer state at iteration {} to {}".format(
     iteration, checkpoint_path))
@@ -131,6 +148,7 @@ def plot_alignment_to_numpy(alignment, info=None):
 
 
 def load_wav_to_torch(full_path):
+  from scipy.io.wavfile import read
   sampling_rate, data = read(full_path)
   return torch.FloatTensor(data.astype(np.float32)), sampling_rate
 
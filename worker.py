@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import importlib
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Set
+
+import numpy as np
+from PySide6.QtCore import QObject, QThread, Signal, Slot
+
+import audio_cache
+from audio_cache import AudioCache
+from model_pool import POOLED_BACKENDS, ModelPool
+from presets import (DEFAULT_SEED, NOISE_SCALE, NOISE_SCALE_W, SAMPLE_RATE,
+                     SymbolPreset)
+
+# Imported on the worker thread by warm_up() so the window can appear first;
+# importing synthesis pulls in torch, the models and the text front-end.
+WARM_UP_MODULES = ("torch", "soundfile", "synthesis")
+
+_job_ids = itertools.count(1)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class SynthesisJob:
+    text: str
+    preset: SymbolPreset
+    speaker_id: Optional[int] = None
+    length_scale: float = 1.0
+    streaming: bool = False
+    seed: int = DEFAULT_SEED
+    batch_g2p: bool = False
+    job_id: int = field(default_factory=lambda: next(_job_ids))
+
+
+class SynthesisWorker(QObject):
+    """Owns the model and runs jobs one after another on its own thread.
+
+    Every slot executes on the worker thread; results go back to the GUI
+    through queued signals.
+    """
+
+    STAGES = ("clean", "cache", "infer")
+
+    ready = Signal(float)
+    model_loaded = Signal(str, object)
+    model_failed = Signal(str)
+    job_started = Signal(int)
+    job_progress = Signal(int, str, int, int)
+    job_chunk = Signal(int, object)
+    job_finished = Signal(int, object)
+    job_failed = Signal(int, str)
+    job_cancelled = Signal(int)
+    cache_stats = Signal(object)
+    pool_stats = Signal(object)
+
+    def __init__(self, pool: Optional[ModelPool] = None,
+                 cache: Optional[AudioCache] = None,
+                 graph_dir: Optional[Path] = None) -> None:
+        super().__init__()
+        self.model = None
+        self.model_digest = ""
+        self.pool = pool or ModelPool()
+        self.cache = cache or AudioCache()
+        self.graph_dir = graph_dir
+        self._cancelled: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def cancel(self, job_id: int) -> None:
+        # Called from the GUI thread, so it only flags the job.
+        with self._lock:
+            self._cancelled.add(job_id)
+
+    def _check_cancelled(self, job_id: int) -> None:
+        with self._lock:
+            if job_id in self._cancelled:
+                self._cancelled.discard(job_id)
+                raise JobCancelled()
+
+    @Slot()
+    def warm_up(self) -> None:
+        start = time.perf_counter()
+        try:
+            for name in WARM_UP_MODULES:
+                importlib.import_module(name)
+        except Exception as exc:
+            self.model_failed.emit(f"初始化失败: {exc}")
+            return
+        self.ready.emit(time.perf_counter() - start)
+
+    @Slot(object, object, object, str)
+    def load_model(self, cfg_path: Path, model_path: Path, preset: SymbolPreset,
+                   backend: str = "eager") -> None:
+        try:
+            import synthesis
+            if backend in POOLED_BACKENDS:
+                # The pool keeps int8 copies too, so switching back does not recalibrate.
+                self.model = self.pool.get(cfg_path, model_path, preset, backend)
+            else:
+                # Other backends wrap the pooled PyTorch model and cache their graphs on disk.
+                model = self.pool.get(cfg_path, model_path, preset)
+                self.model = synthesis.wrap_backend(model, backend, model_path, self.graph_dir, preset)
+                if self.model is model:
+                    # The backend fell back to the plain model (bf16 without CPU
+                    # support), so its audio is eager audio and shares those cache keys.
+                    backend = "eager"
+            self.model_digest = audio_cache.checkpoint_digest(model_path)
+            if backend != "eager":
+                self.model_digest += f":{backend}"
+            self.model_loaded.emit(model_path.name, self.pool.stats())
+        except Exception as exc:
+            self.model_failed.emit(str(exc))
+
+    @Slot(int)
+    def set_pool_budget(self, budget_mb: int) -> None:
+        # Runs on the worker thread, so it never waits on a model load holding the pool.
+        self.pool.set_budget(budget_mb * 1024 * 1024)
+        self.pool_stats.emit(self.pool.stats())
+
+    @Slot(object)
+    def run_job(self, job: SynthesisJob) -> None:
+        try:
+            self._check_cancelled(job.job_id)
+            if self.model is None:
+                raise RuntimeError("模型未加载")
+            self.job_started.emit(job.job_id)
+
+            if job.streaming:
+                audio = self._synthesize_streaming(job)
+            else:
+                audio = self._synthesize_segment(job, job.text, 1, 1)
+            self.job_finished.emit(job.job_id, audio)
+        except JobCancelled:
+            self.job_cancelled.emit(job.job_id)
+        except Exception as exc:
+            self.job_failed.emit(job.job_id, str(exc))
+        self.cache_stats.emit(self.cache.stats())
+
+    def _synthesize_segment(self, job: SynthesisJob, text: str, step: int, total: int) -> np.ndarray:
+        import synthesis
+        self.job_progress.emit(job.job_id, "clean", step, total)
+        phonemes = synthesis.clean_phonemes(text, job.preset, job.batch_g2p)
+        self._check_cancelled(job.job_id)
+
+        key = audio_cache.make_key(self.model_digest, job.preset.id, phonemes, job.speaker_id,
+                                   job.length_scale, NOISE_SCALE, NOISE_SCALE_W, job.seed)
+        audio = self.cache.get(key)
+        if audio is not None:
+            self.job_progress.emit(job.job_id, "cache", step, total)
+            return audio
+
+        self.job_progress.emit(job.job_id, "infer", step, total)
+        stn = synthesis.encode_phonemes(phonemes, job.preset)
+        audio = synthesis.synthesize(self.model, stn, job.speaker_id,
+                                     length_scale=job.length_scale, seed=job.seed)
+        self._check_cancelled(job.job_id)
+        self.cache.put(key, audio)
+        return audio
+
+    def _synthesize_streaming(self, job: SynthesisJob) -> np.ndarray:
+        import synthesis
+        sentences = synthesis.split_sentences(job.text) or [job.text]
+        joiner = synthesis.SegmentJoiner(SAMPLE_RATE)
+        chunks = []
+        for i, sentence in enumerate(sentences, 1):
+            chunk = joiner.push(self._synthesize_segment(job, sentence, i, len(sentences)))
+            chunks.append(chunk)
+            self.job_chunk.emit(job.job_id, chunk)
+        tail = joiner.finish()
+        chunks.append(tail)
+        self.job_chunk.emit(job.job_id, tail)
+        return np.concatenate(chunks)
+
+
+class SynthesisService(QObject):
+    """GUI-side handle that owns the worker thread and its job queue."""
+
+    _submit = Signal(object)
+    _load = Signal(object, object, object, str)
+    _warm_up = Signal()
+    _set_pool_budget = Signal(int)
+
+    def __init__(self, parent: Optional[QObject] = None,
+                 cache_dir: Optional[Path] = None,
+                 graph_dir: Optional[Path] = None) -> None:
+        super().__init__(parent)
+        self.pending: Set[int] = set()
+        self._thread = QThread()
+        self.worker = SynthesisWorker(cache=AudioCache(cache_dir), graph_dir=graph_dir)
+        self.worker.moveToThread(self._thread)
+        # Queued connections: jobs are delivered in order through the worker's
+        # event loop, so back-to-back submissions simply queue up.
+        self._submit.connect(self.worker.run_job)
+        self._load.connect(self.worker.load_model)
+        self._warm_up.connect(self.worker.warm_up)
+        self._set_pool_budget.connect(self.worker.set_pool_budget)
+        for signal in (self.worker.job_finished, self.worker.job_failed, self.worker.job_cancelled):
+            signal.connect(self._job_done)
+        self._thread.start()
+
+    def warm_up(self) -> None:
+        """Start the background imports; jobs submitted meanwhile queue behind them."""
+        self._warm_up.emit()
+
+    def load_model(self, cfg_path: Path, model_path: Path, preset: SymbolPreset,
+                   backend: str = "eager") -> None:
+        self._load.emit(cfg_path, model_path, preset, backend)
+
+    def set_pool_budget(self, budget_mb: int) -> None:
+        """Change the model pool's memory budget; models over it are evicted LRU first."""
+        self._set_pool_budget.emit(budget_mb)
+
+    def submit(self, job: SynthesisJob) -> int:
+        self.pending.add(job.job_id)
+        self._submit.emit(job)
+        return job.job_id
+
+    def cancel(self, job_id: int) -> None:
+        if job_id in self.pending:
+            self.worker.cancel(job_id)
+
+    def cancel_all(self) -> None:
+        for job_id in list(self.pending):
+            self.worker.cancel(job_id)
+
+    def shutdown(self) -> None:
+        self.cancel_all()
+        self._thread.quit()
+        self._thread.wait()
+
+    @Slot(int)
+    def _job_done(self, job_id: int) -> None:
+        self.pending.discard(job_id)